@@ -0,0 +1,141 @@
+"""
+Load test for event loop blocking: measures the latency of GET /pages/{id}
+alone and while slow Kubernetes status calls are in flight. A route that
+blocks the event loop shows up as page latencies close to the Kubernetes
+delay.
+
+Run from the backend directory against the configured database:
+
+    poetry run python -m benchmarks.event_loop_latency
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+from src.backend import app
+from src.data.database import SessionLocalSurveyDesign
+from src.data.models import Application, Page, Project, Survey
+from src.routers import projects as projects_router
+
+
+def seed():
+    with SessionLocalSurveyDesign() as db:
+        project = Project(name=f"loadtest-{uuid.uuid4().hex[:8]}")
+        db.add(project)
+        db.flush()
+        db.add(Application(project_id=project.id, ros_version="1"))
+        survey = Survey(title="loadtest", project_id=project.id)
+        db.add(survey)
+        db.flush()
+        page = Page(name="loadtest", survey_id=survey.id, order=0)
+        db.add(page)
+        db.commit()
+        return project.id, page.id
+
+
+def remove(project_id: int):
+    with SessionLocalSurveyDesign() as db:
+        project = db.get(Project, project_id)
+        for survey in db.query(Survey).filter(Survey.project_id == project_id):
+            db.delete(survey)
+        db.delete(project.application)
+        db.delete(project)
+        db.commit()
+
+
+def slow_application_status(delay: float):
+    def get_application_status(application_name: str, namespace: str):
+        # stands in for a Kubernetes API call that takes long to answer
+        time.sleep(delay)
+        return "Unknown"
+
+    return get_application_status
+
+
+async def measure_pages(
+    client: httpx.AsyncClient, page_id: int, requests: int, concurrency: int
+) -> np.ndarray:
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get(f"/api/pages/{page_id}")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(
+        *(worker(requests // concurrency) for _ in range(concurrency))
+    )
+    return np.array(latencies) * 1000
+
+
+async def keep_slow_calls_running(
+    client: httpx.AsyncClient, project_id: int, parallel: int, stop: asyncio.Event
+):
+    async def worker():
+        while not stop.is_set():
+            await client.get(f"/api/projects/{project_id}/application")
+
+    await asyncio.gather(*(worker() for _ in range(parallel)))
+
+
+def report(name: str, latencies: np.ndarray):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:>22}: p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  ({len(latencies)} requests)")
+    return p99
+
+
+async def run(args) -> bool:
+    project_id, page_id = seed()
+    projects_router.get_application_status = slow_application_status(args.k8s_delay)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", timeout=None
+        ) as client:
+            baseline = await measure_pages(
+                client, page_id, args.requests, args.concurrency
+            )
+
+            stop = asyncio.Event()
+            slow_calls = asyncio.create_task(
+                keep_slow_calls_running(client, project_id, args.slow_calls, stop)
+            )
+            # let the slow calls get in flight first
+            await asyncio.sleep(0.1)
+            loaded = await measure_pages(
+                client, page_id, args.requests, args.concurrency
+            )
+            stop.set()
+            await slow_calls
+    finally:
+        remove(project_id)
+
+    report("GET /pages/{id}", baseline)
+    p99 = report("with slow k8s calls", loaded)
+
+    # a blocked event loop makes page requests wait for the Kubernetes call
+    return p99 < args.k8s_delay * 1000 / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow-calls", type=int, default=4)
+    parser.add_argument("--k8s-delay", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        print("p99 latency spiked while slow Kubernetes calls were running")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for serializing items into schemas.Item, with template
+fields resolved in SQL (Item.resolved_<field>) against resolving them in
+Python through the lazily loaded Item.template, as models.Item did before.
+
+Runs on an in-memory SQLite database:
+
+    poetry run python -m benchmarks.item_serialization
+"""
+import argparse
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from src.data import schemas
+from src.data.database import create_db_engine
+from src.data.models import ITEM_TEMPLATE_FIELDS, Base, Item, ItemTemplate
+
+ITEMS = TypeAdapter(List[schemas.Item])
+
+
+def seed(db: Session, items: int, templates: int):
+    db_templates = [
+        ItemTemplate(
+            title=f"template {i}",
+            prompt="How do you rate the robot?",
+            item_type="question",
+            question_type="scale",
+            scale_min=1,
+            scale_max=5,
+        )
+        for i in range(templates)
+    ]
+    db.add_all(db_templates)
+    db.flush()
+    # every other item only references a template
+    db.add_all(
+        Item(template_id=db_templates[i % templates].id)
+        if i % 2
+        else Item(
+            title=f"item {i}",
+            item_type="question",
+            question_type="multiple_choice_single",
+            options=["yes", "no"],
+        )
+        for i in range(items)
+    )
+    db.commit()
+
+
+def serialize_resolved_in_sql(db: Session) -> bytes:
+    return ITEMS.dump_json(ITEMS.validate_python(db.scalars(select(Item)).all()))
+
+
+def serialize_resolved_in_python(db: Session) -> bytes:
+    items = []
+    for item in db.scalars(select(Item)):
+        data = {"id": item.id}
+        for field in ITEM_TEMPLATE_FIELDS:
+            value = getattr(item, field)
+            if value is None and item.template is not None:
+                value = getattr(item.template, field)
+            data[field] = value
+        items.append(data)
+    return ITEMS.dump_json(ITEMS.validate_python(items))
+
+
+def measure(engine, serialize, repeat: int):
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(repeat):
+            # a new session per run, as per request
+            with Session(engine) as db:
+                start = time.perf_counter()
+                content = serialize(db)
+                timings.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return min(timings) * 1000, statements // repeat, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--templates", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, args.items, args.templates)
+
+    results = {}
+    for name, serialize in (
+        ("template in Python", serialize_resolved_in_python),
+        ("template in SQL", serialize_resolved_in_sql),
+    ):
+        duration, statements, content = measure(engine, serialize, args.repeat)
+        results[name] = content
+        print(f"{name:>18}: {duration:8.1f} ms  {statements:5d} statements")
+
+    assert len(set(results.values())) == 1, "serializations differ"
+
+
+if __name__ == "__main__":
+    main()
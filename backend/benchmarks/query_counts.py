@@ -0,0 +1,242 @@
+"""
+Query-count harness: counts the SQL statements of the read endpoints for a
+small and a large data set on a temporary SQLite database. Fails if an
+endpoint exceeds its bound or its count grows with the number of rows,
+i.e. if serialization lazily loads relationships per row.
+
+    poetry run python -m benchmarks.query_counts
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.backend import app
+from src.crud import publications as publications_crud
+from src.data.database import (
+    create_async_db_engine,
+    create_db_engine,
+    get_async_db,
+    get_db,
+)
+from src.data.models import (
+    Answer,
+    Application,
+    Base,
+    Container,
+    Item,
+    ItemTemplate,
+    Page,
+    Participant,
+    PortMap,
+    Project,
+    Publication,
+    Survey,
+    page_item_association,
+)
+from src.utils import survey_bundle
+
+# endpoint path (formatted with the ids of the seeded rows) and the maximum
+# number of statements one request may execute
+ENDPOINTS: List[Tuple[str, int]] = [
+    ("/api/projects/", 1),
+    ("/api/projects/{project_id}", 1),
+    ("/api/projects/{project_id}/publications", 1),
+    ("/api/projects/{project_id}/application/containers", 1),
+    ("/api/projects/{project_id}/survey", 3),
+    ("/api/publications/", 1),
+    ("/api/publications/{publication_id}", 1),
+    ("/api/publications/uuid/{link_uuid}", 1),
+    ("/api/publications/uuid/{link_uuid}/bundle", 4),
+    ("/api/surveys/{survey_id}", 3),
+    ("/api/surveys/{survey_id}/pages/", 3),
+    ("/api/surveys/{survey_id}/answers/", 1),
+    ("/api/pages/{page_id}", 2),
+    ("/api/pages/{page_id}/items/", 2),
+    ("/api/items/", 1),
+    ("/api/items/{item_id}", 1),
+    ("/api/participants/{participant_id}/answers/", 1),
+]
+
+# CRUD functions used by routes that cannot run here (they talk to Kubernetes)
+FUNCTIONS: List[Tuple[str, Callable[[Session, Dict], object], int]] = [
+    (
+        "publications_crud.get_endpoints",
+        lambda db, ids: publications_crud.get_endpoints(
+            db, ids["application_id"], ids["participant_id"]
+        ),
+        4,
+    ),
+]
+
+
+def seed(db: Session, rows: int) -> Dict:
+    """
+    Creates a project with `rows` containers, publications, pages, items per
+    page and answers, and returns the ids to format the endpoints with.
+    """
+    project = Project(name="querycount")
+    db.add(project)
+    db.flush()
+    application = Application(project_id=project.id, ros_version="1")
+    survey = Survey(title="querycount", project_id=project.id)
+    template = ItemTemplate(title="template", item_type="question")
+    participant = Participant()
+    db.add_all([application, survey, template, participant])
+    db.flush()
+
+    for i in range(rows):
+        container = Container(
+            application=application, name=f"c{i}", dockerfile="Dockerfile"
+        )
+        container.ports = [PortMap(internal_port=80), PortMap(internal_port=8080)]
+        db.add(container)
+        db.add(
+            Publication(
+                name=f"p{i}",
+                project_id=project.id,
+                start_date=datetime(2024, 1, 1),
+            )
+        )
+
+    pages = [Page(name=f"page {i}", survey_id=survey.id, order=i) for i in range(rows)]
+    items = [
+        Item(template_id=template.id) if i % 2 else Item(title=f"item {i}", item_type="static_text")
+        for i in range(rows)
+    ]
+    db.add_all(pages + items)
+    db.flush()
+    for page in pages:
+        db.execute(
+            insert(page_item_association),
+            [
+                {"page_id": page.id, "item_id": item.id, "order": order}
+                for order, item in enumerate(items)
+            ],
+        )
+        db.add_all(
+            Answer(
+                participant_id=participant.id,
+                item_id=item.id,
+                page_id=page.id,
+                value=1,
+            )
+            for item in items[page.order :: rows]
+        )
+    db.commit()
+
+    publication = db.query(Publication).filter_by(project_id=project.id).first()
+    return {
+        "project_id": project.id,
+        "application_id": application.id,
+        "publication_id": publication.id,
+        "link_uuid": publication.link_uuid,
+        "survey_id": survey.id,
+        "page_id": pages[0].id,
+        "item_id": items[1].id,
+        "participant_id": participant.id,
+    }
+
+
+def count_statements(engines: List[Engine], run: Callable[[], object]) -> int:
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        run()
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+    return statements
+
+
+def measure(rows: int) -> Dict[str, int]:
+    # a file, as the routes on the async session need to see the same database
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'query_counts.db')}"
+        engine = create_db_engine(url)
+        async_engine = create_async_db_engine(url)
+        try:
+            return _measure(rows, engine, async_engine)
+        finally:
+            engine.dispose()
+            asyncio.run(async_engine.dispose())
+
+
+def _measure(
+    rows: int, engine: Engine, async_engine: AsyncEngine
+) -> Dict[str, int]:
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+    )
+    engines = [engine, async_engine.sync_engine]
+
+    def get_test_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def get_test_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    with SessionLocal() as db:
+        ids = seed(db, rows)
+
+    # bundles cached for the previous database would be served otherwise
+    survey_bundle._bundles.clear()
+
+    counts = {}
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_async_db] = get_test_async_db
+    try:
+        client = TestClient(app)
+        for path, _ in ENDPOINTS:
+            url = path.format(**ids)
+
+            def request():
+                client.get(url).raise_for_status()
+
+            counts[path] = count_statements(engines, request)
+    finally:
+        app.dependency_overrides.pop(get_db)
+        app.dependency_overrides.pop(get_async_db)
+
+    for name, function, _ in FUNCTIONS:
+        with SessionLocal() as db:
+            counts[name] = count_statements(engines, lambda: function(db, ids))
+    return counts
+
+
+def main():
+    small, large = measure(rows=2), measure(rows=20)
+    bounds = dict(ENDPOINTS) | {name: bound for name, _, bound in FUNCTIONS}
+
+    failed = False
+    for name, bound in bounds.items():
+        ok = large[name] <= bound and small[name] == large[name]
+        failed |= not ok
+        print(
+            f"{'ok  ' if ok else 'FAIL'} {name:<55} "
+            f"{small[name]:3d} / {large[name]:3d} statements (max {bound})"
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
+import gc
 import os
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .data.database import engine_db
-from .data.models import Base
+from .data.database import async_engine_db, engine_db
+from .k8s_sync import reconciler
 from .routers.answers import router as answers_router
 from .routers.applications import router as applications_router
 from .routers.authentication import router as authentication_router
@@ -16,6 +18,11 @@ from .routers.participants import router as participants_router
 from .routers.projects import router as projects_router
 from .routers.publications import router as publications_router
 from .routers.surveys import router as surveys_router
+from .utils.answer_buffer import ANSWER_WRITE_BEHIND, answer_buffer
+from .utils.event_writer import page_event_writer
+from .utils.kubernetes import close_k8s_client, start_k8s_caches
+from .utils.pagination import NEXT_CURSOR_HEADER
+from .utils.query_plans import check_query_plans
 
 load_dotenv()
 if os.getenv("ENVIRONMENT") == "prod":
@@ -26,10 +33,30 @@ else:
 
 DOMAIN = os.getenv("DOMAIN")
 
-# Initialize database
-Base.metadata.create_all(bind=engine_db)
+# The schema is managed by the migration job (python -m src.jobs.migrate)
+if os.getenv("ENVIRONMENT") != "prod":
+    check_query_plans(engine_db)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ANSWER_WRITE_BEHIND:
+        # replays the answers journaled but not written before a crash
+        answer_buffer.start()
+    start_k8s_caches()
+    # writes the Survey objects of projects changed while the backend was down
+    reconciler.start()
+    yield
+    # write the answers and page events still buffered before the process exits
+    if ANSWER_WRITE_BEHIND:
+        answer_buffer.stop()
+    page_event_writer.stop()
+    reconciler.stop()
+    close_k8s_client()
+    await async_engine_db.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -38,6 +65,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(answers_router, prefix="/api", tags=["answers"])
@@ -51,6 +79,11 @@ app.include_router(publications_router, prefix="/api", tags=["publications"])
 app.include_router(surveys_router, prefix="/api", tags=["surveys"])
 app.include_router(authentication_router, prefix="/api", tags=["authentication"])
 
+# The modules, routes and models loaded above live as long as the process.
+# Moved out of the garbage collector's reach, full collections only scan
+# what requests allocate instead of pausing all requests for ~100 ms.
+gc.freeze()
+
 # TODO: woanders?!
 # @app.post("/cleanup")
 # async def cleanup(
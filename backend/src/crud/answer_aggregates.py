@@ -0,0 +1,237 @@
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..data.enums import QuestionType
+from ..data.models import Answer, AnswerAggregate, Item, ItemTemplate, Page
+from ..utils.export import _as_float
+
+# Question types whose answers are counted per value, answers of all other
+# items (free text) share one bucket per page and item
+BUCKETED_QUESTION_TYPES = (
+    QuestionType.SCALE,
+    QuestionType.LIKERT_SCALE,
+    QuestionType.MATRIX_SCALE,
+    QuestionType.MULTIPLE_CHOICE_SINGLE,
+    QuestionType.MULTIPLE_CHOICE_MULTIPLE,
+)
+UNBUCKETED = ""
+
+# Answers fetched per round trip while rebuilding the aggregates
+REBUILD_BATCH_SIZE = 1000
+# Session.info key of the items whose aggregates are recounted after the flush
+RECOUNT_ITEMS_KEY = "recount_answer_aggregates"
+
+# (page_id, item_id, value) of an answer
+AnswerValue = Tuple[int, int, Any]
+AggregateKey = Tuple[int, int, str]
+
+
+def _upsert_aggregates(db: Session):
+    """
+    INSERT into answer_aggregates that adds to the existing row of the page,
+    item and bucket instead.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = postgresql.insert(AnswerAggregate)
+    else:
+        stmt = sqlite.insert(AnswerAggregate)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            AnswerAggregate.page_id,
+            AnswerAggregate.item_id,
+            AnswerAggregate.bucket,
+        ],
+        set_={
+            "count": AnswerAggregate.count + stmt.excluded.count,
+            "value_sum": AnswerAggregate.value_sum + stmt.excluded.value_sum,
+            "value_sum_squares": AnswerAggregate.value_sum_squares
+            + stmt.excluded.value_sum_squares,
+        },
+    )
+
+
+def _bucketed_items(db: Session, item_ids: Optional[Iterable[int]]) -> Set[int]:
+    stmt = select(Item.id).where(
+        Item.resolved_question_type.in_(BUCKETED_QUESTION_TYPES)
+    )
+    if item_ids is not None:
+        stmt = stmt.where(Item.id.in_(set(item_ids)))
+    return set(db.scalars(stmt))
+
+
+def _add_deltas(
+    deltas: Dict[AggregateKey, List[float]],
+    answers: Iterable[AnswerValue],
+    bucketed: Set[int],
+    sign: int,
+):
+    for page_id, item_id, value in answers:
+        number = 0
+        if item_id in bucketed:
+            bucket = json.dumps(value, sort_keys=True)
+            # parsed like the statistics parse the bucket, numeric strings count
+            number = _as_float(value)
+            if math.isnan(number):
+                number = 0
+        else:
+            bucket = UNBUCKETED
+        delta = deltas.setdefault((page_id, item_id, bucket), [0, 0, 0])
+        delta[0] += sign
+        delta[1] += sign * number
+        delta[2] += sign * number * number
+
+
+def _write_deltas(db: Session, deltas: Dict[AggregateKey, List[float]]):
+    rows = [
+        {
+            "page_id": page_id,
+            "item_id": item_id,
+            "bucket": bucket,
+            "count": count,
+            "value_sum": value_sum,
+            "value_sum_squares": value_sum_squares,
+        }
+        for (page_id, item_id, bucket), (count, value_sum, value_sum_squares) in (
+            deltas.items()
+        )
+        if count or value_sum or value_sum_squares
+    ]
+    if rows:
+        db.execute(_upsert_aggregates(db), rows)
+
+    # buckets without answers left would keep their page and item from being
+    # deleted, as they reference them
+    emptied = [key for key, (count, _, _) in deltas.items() if count < 0]
+    if emptied:
+        db.execute(
+            delete(AnswerAggregate).where(
+                tuple_(
+                    AnswerAggregate.page_id,
+                    AnswerAggregate.item_id,
+                    AnswerAggregate.bucket,
+                ).in_(emptied),
+                AnswerAggregate.count <= 0,
+            )
+        )
+
+
+def get_answer_values(
+    db: Session, keys: Iterable[Tuple[int, int]]
+) -> List[AnswerValue]:
+    """
+    Returns the current answers for the (participant_id, item_id) pairs,
+    locking them on PostgreSQL until the transaction ends, so they can be
+    replaced and their aggregates updated without a concurrent change in between.
+    """
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(Answer.page_id, Answer.item_id, Answer.value)
+            .where(tuple_(Answer.participant_id, Answer.item_id).in_(set(keys)))
+            .with_for_update()
+        )
+    ]
+
+
+def apply_answer_changes(
+    db: Session, removed: List[AnswerValue], added: List[AnswerValue]
+):
+    """
+    Updates the aggregates for answers that were removed or replaced and
+    answers that were added, in the caller's transaction.
+    """
+    bucketed = _bucketed_items(db, (item_id for _, item_id, _ in removed + added))
+    deltas: Dict[AggregateKey, List[float]] = {}
+    _add_deltas(deltas, removed, bucketed, -1)
+    _add_deltas(deltas, added, bucketed, 1)
+    _write_deltas(db, deltas)
+
+
+def _recount_aggregates(db: Session, item_ids: Optional[List[int]]):
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE answer_aggregates IN EXCLUSIVE MODE"))
+
+    stmt = delete(AnswerAggregate)
+    answers = select(Answer.page_id, Answer.item_id, Answer.value)
+    if item_ids is not None:
+        stmt = stmt.where(AnswerAggregate.item_id.in_(item_ids))
+        answers = answers.where(Answer.item_id.in_(item_ids))
+    # on SQLite, the delete takes the write lock before the answers are read
+    db.execute(stmt)
+
+    bucketed = _bucketed_items(db, item_ids)
+    deltas: Dict[AggregateKey, List[float]] = {}
+    result = db.execute(answers.execution_options(yield_per=REBUILD_BATCH_SIZE))
+    for partition in result.partitions():
+        _add_deltas(deltas, partition, bucketed, 1)
+    _write_deltas(db, deltas)
+
+
+def rebuild_answer_aggregates(db: Session, item_ids: Optional[List[int]] = None):
+    """
+    Recounts the aggregates of the given items, or of all items, from the
+    answers. Writers wait for the rebuild, so no change is lost or counted twice.
+    """
+    _recount_aggregates(db, item_ids)
+    db.commit()
+
+
+def _has_changes(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "before_flush")
+def collect_items_with_changed_question_types(
+    session: Session, flush_context, instances
+):
+    """
+    The aggregates of an item depend on its question type, which an edit of
+    the item or of its template changes.
+    """
+    item_ids, template_ids = set(), set()
+    for obj in session.dirty:
+        if isinstance(obj, Item) and _has_changes(obj, "question_type", "template_id"):
+            item_ids.add(obj.id)
+        elif isinstance(obj, ItemTemplate) and _has_changes(obj, "question_type"):
+            template_ids.add(obj.id)
+
+    if template_ids:
+        item_ids.update(
+            session.scalars(select(Item.id).where(Item.template_id.in_(template_ids)))
+        )
+    if item_ids:
+        session.info.setdefault(RECOUNT_ITEMS_KEY, set()).update(item_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def recount_aggregates_of_changed_items(session: Session, flush_context):
+    """Recounts the collected items' aggregates in the flushing transaction."""
+    item_ids = session.info.pop(RECOUNT_ITEMS_KEY, None)
+    if item_ids:
+        _recount_aggregates(session, sorted(item_ids))
+
+
+def get_survey_aggregates(db: Session, survey_id: int) -> List[Tuple]:
+    """
+    Returns (item_id, bucket, count, value_sum, value_sum_squares) of the
+    answers on the pages of a survey, summed over the pages.
+    """
+    return db.execute(
+        select(
+            AnswerAggregate.item_id,
+            AnswerAggregate.bucket,
+            func.sum(AnswerAggregate.count),
+            func.sum(AnswerAggregate.value_sum),
+            func.sum(AnswerAggregate.value_sum_squares),
+        )
+        .join(Page, Page.id == AnswerAggregate.page_id)
+        .where(Page.survey_id == survey_id)
+        .group_by(AnswerAggregate.item_id, AnswerAggregate.bucket)
+        .having(func.sum(AnswerAggregate.count) > 0)
+    ).all()
@@ -1,19 +1,106 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from ..data import schemas
 from ..data.models import Answer, Item, Page
+from .answer_aggregates import apply_answer_changes, get_answer_values
+from ..utils.pagination import keyset
+
+
+def _upsert_answers(db: Session):
+    """
+    INSERT into answers that updates the existing answer of the participant
+    for the item instead, relying on the unique (participant_id, item_id) index.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = postgresql.insert(Answer)
+    else:
+        stmt = sqlite.insert(Answer)
+    return stmt.on_conflict_do_update(
+        index_elements=[Answer.participant_id, Answer.item_id],
+        set_={
+            "page_id": stmt.excluded.page_id,
+            "value": stmt.excluded.value,
+            "updated_at": func.now(),
+        },
+    )
 
 
 def create_answer(db: Session, answer: schemas.AnswerCreate) -> Answer:
-    db_answer = Answer(**answer.model_dump())
-    db.add(db_answer)
+    replaced = get_answer_values(db, [(answer.participant_id, answer.item_id)])
+    db_answer = db.scalars(
+        _upsert_answers(db).values(**answer.model_dump()).returning(Answer),
+        execution_options={"populate_existing": True},
+    ).one()
+    apply_answer_changes(
+        db, replaced, [(db_answer.page_id, db_answer.item_id, db_answer.value)]
+    )
     db.commit()
-    db.refresh(db_answer)
     return db_answer
 
 
+def upsert_page_answers(
+    db: Session, participant_id: int, page_id: int, answers: List[schemas.PageAnswer]
+) -> Dict[int, int]:
+    """
+    Saves all answers of a page in one statement, updating the participant's
+    existing answer for an item instead of adding another one, so resubmitting
+    the same page is idempotent.
+
+    Returns a mapping of item id to answer id.
+    """
+    answer_ids = upsert_answers(
+        db,
+        [
+            {
+                "participant_id": participant_id,
+                "item_id": answer.item_id,
+                "page_id": page_id,
+                "value": answer.value,
+            }
+            for answer in answers
+        ],
+    )
+    return {item_id: answer_id for (_, item_id), answer_id in answer_ids.items()}
+
+
+def upsert_answers(
+    db: Session, answers: List[Dict[str, Any]]
+) -> Dict[Tuple[int, int], int]:
+    """
+    Saves answers of any participants in one transaction, updating the
+    existing answer of a participant for an item. Of several answers for the
+    same participant and item, the last one is kept.
+
+    Returns a mapping of (participant id, item id) to answer id.
+    """
+    rows = {(answer["participant_id"], answer["item_id"]): answer for answer in answers}
+    if not rows:
+        return {}
+
+    replaced = get_answer_values(db, rows.keys())
+    answer_ids = {
+        (participant_id, item_id): answer_id
+        for participant_id, item_id, answer_id in db.execute(
+            _upsert_answers(db).returning(
+                Answer.participant_id, Answer.item_id, Answer.id
+            ),
+            list(rows.values()),
+        )
+    }
+    apply_answer_changes(
+        db,
+        replaced,
+        [(row["page_id"], row["item_id"], row["value"]) for row in rows.values()],
+    )
+    db.commit()
+
+    return answer_ids
+
+
 def get_answer(db: Session, answer_id: int) -> Optional[Answer]:
     return db.query(Answer).filter(Answer.id == answer_id).first()
 
@@ -23,9 +110,13 @@ def update_answer(
 ) -> Optional[Answer]:
     db_answer = get_answer(db, answer_id)
     if db_answer:
+        replaced = (db_answer.page_id, db_answer.item_id, db_answer.value)
         update_data = answer.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_answer, key, value)
+        apply_answer_changes(
+            db, [replaced], [(db_answer.page_id, db_answer.item_id, db_answer.value)]
+        )
         db.commit()
         db.refresh(db_answer)
     return db_answer
@@ -34,24 +125,43 @@ def update_answer(
 def delete_answer(db: Session, answer_id: int) -> bool:
     db_answer = get_answer(db, answer_id)
     if db_answer:
+        apply_answer_changes(
+            db, [(db_answer.page_id, db_answer.item_id, db_answer.value)], []
+        )
         db.delete(db_answer)
         db.commit()
         return True
     return False
 
 
-def get_answers_by_participant(db: Session, participant_id: int) -> List[Answer]:
-    return db.query(Answer).filter(Answer.participant_id == participant_id).all()
+def get_answers_by_participant(
+    db: Session,
+    participant_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[Answer]:
+    query = db.query(Answer).filter(Answer.participant_id == participant_id)
+    return keyset(query, Answer.id, after_id, limit).all()
 
 
-def get_answers_by_item(db: Session, item_id: int) -> List[Answer]:
-    return db.query(Answer).filter(Answer.item_id == item_id).all()
+def get_answers_by_item(
+    db: Session,
+    item_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[Answer]:
+    query = db.query(Answer).filter(Answer.item_id == item_id)
+    return keyset(query, Answer.id, after_id, limit).all()
 
 
-def get_answers_by_survey(db: Session, survey_id: int) -> List[Answer]:
-    return (
-        db.query(Answer).join(Item).join(Page).filter(Page.survey_id == survey_id).all()
-    )
+def get_answers_by_survey(
+    db: Session,
+    survey_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[Answer]:
+    query = db.query(Answer).join(Item).join(Page).filter(Page.survey_id == survey_id)
+    return keyset(query, Answer.id, after_id, limit).all()
 
 
 def get_latest_answer_by_participant_and_item(
@@ -63,6 +173,5 @@ def get_latest_answer_by_participant_and_item(
             Answer.participant_id == participant_id,
             Answer.item_id == item_id,
         )
-        .order_by(Answer.updated_at.desc())
         .first()
     )
@@ -3,7 +3,7 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from ..data import schemas
-from ..data.models import Answer, Item
+from ..data.models import Answer, Item, page_item_association
 
 
 # Create a new item (question, image, video, text, etc.)
@@ -63,4 +63,10 @@ def delete_item(db: Session, item_id: int):
 
 
 def get_items_by_page(db: Session, page_id: int) -> List[Item]:
-    return db.query(Item).filter(Item.page_id == page_id).all()
+    return (
+        db.query(Item)
+        .join(page_item_association, page_item_association.c.item_id == Item.id)
+        .filter(page_item_association.c.page_id == page_id)
+        .order_by(page_item_association.c.order)
+        .all()
+    )
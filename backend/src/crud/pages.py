@@ -1,10 +1,17 @@
 from typing import List, Optional
 
-from sqlalchemy import delete, func, insert
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from ..data import schemas
 from ..data.models import Page, page_item_association
+from .surveys import bump_survey_versions
+
+
+def _bump_survey_version_of_page(db: Session, page_id: int):
+    survey_id = db.query(Page.survey_id).filter(Page.id == page_id).scalar()
+    bump_survey_versions(db, [survey_id])
 
 
 def create_page(db: Session, page: schemas.PageCreate) -> Page:
@@ -20,7 +27,18 @@ def create_page(db: Session, page: schemas.PageCreate) -> Page:
 
 
 def get_page(db: Session, page_id: int) -> Optional[Page]:
-    return db.query(Page).filter(Page.id == page_id).first()
+    return (
+        db.query(Page)
+        .options(selectinload(Page.items))
+        .filter(Page.id == page_id)
+        .first()
+    )
+
+
+async def get_page_async(db: AsyncSession, page_id: int) -> Optional[Page]:
+    return await db.scalar(
+        select(Page).options(selectinload(Page.items)).where(Page.id == page_id)
+    )
 
 
 def update_page(db: Session, page_id: int, page: schemas.PageUpdate) -> Optional[Page]:
@@ -62,6 +80,7 @@ def add_item_to_page(db: Session, page_id: int, item_id: int) -> bool:
     )
     try:
         db.execute(stmt)
+        _bump_survey_version_of_page(db, page_id)
         db.commit()
         return True
     except Exception as e:
@@ -80,6 +99,7 @@ def remove_item_from_page(db: Session, page_id: int, item_id: int) -> bool:
     )
     try:
         result = db.execute(stmt)
+        _bump_survey_version_of_page(db, page_id)
         db.commit()
         return result.rowcount > 0
     except Exception as e:
@@ -103,6 +123,7 @@ def reorder_items_on_page(
                 .values(order=item_order.order)
             )
             db.execute(stmt)
+        _bump_survey_version_of_page(db, page_id)
         db.commit()
         return True
     except Exception as e:
@@ -112,7 +133,13 @@ def reorder_items_on_page(
 
 
 def get_pages_by_survey(db: Session, survey_id: int) -> List[Page]:
-    return db.query(Page).filter(Page.survey_id == survey_id).order_by(Page.order).all()
+    return (
+        db.query(Page)
+        .options(selectinload(Page.items))
+        .filter(Page.survey_id == survey_id)
+        .order_by(Page.order)
+        .all()
+    )
 
 
 def remove_page_from_survey(db: Session, survey_id: int, page_id: int) -> bool:
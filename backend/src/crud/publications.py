@@ -1,11 +1,14 @@
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID, uuid4
 
 from kubernetes.client.api_client import os
 from kubernetes.client.configuration import logging
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from ..data import models, schemas
+from ..utils.pagination import keyset
 
 DOMAIN = os.getenv("DOMAIN")
 
@@ -13,6 +16,11 @@ DOMAIN = os.getenv("DOMAIN")
 def get_endpoints(db: Session, application_id: int, participant_id: int) -> list[str]:
     db_application = (
         db.query(models.Application)
+        .options(
+            selectinload(models.Application.containers).selectinload(
+                models.Container.ports
+            )
+        )
         .filter(models.Application.id == application_id)
         .first()
     )
@@ -49,6 +57,12 @@ def get_participant(db: Session, participant_id: int) -> Optional[models.Partici
     )
 
 
+async def get_participant_async(
+    db: AsyncSession, participant_id: int
+) -> Optional[models.Participant]:
+    return await db.get(models.Participant, participant_id)
+
+
 def create_publication(db: Session, publication: schemas.PublicationCreate):
     db_publication = models.Publication(**publication.model_dump(), link_uuid=uuid4())
     db.add(db_publication)
@@ -60,6 +74,11 @@ def create_publication(db: Session, publication: schemas.PublicationCreate):
 def get_publication(db: Session, publication_id: int):
     return (
         db.query(models.Publication)
+        .options(
+            joinedload(models.Publication.project).joinedload(
+                models.Project.application
+            )
+        )
         .filter(models.Publication.id == publication_id)
         .first()
     )
@@ -74,8 +93,36 @@ def get_publication_by_uuid(db: Session, link_uuid: str):
     )
 
 
-def get_publications(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Publication).offset(skip).limit(limit).all()
+async def get_publication_by_uuid_async(db: AsyncSession, link_uuid: str):
+    return await db.scalar(
+        select(models.Publication).where(
+            models.Publication.link_uuid == UUID(link_uuid)
+        )
+    )
+
+
+def get_publication_survey_version_by_uuid(
+    db: Session, link_uuid: str
+) -> Optional[Tuple[models.Publication, Optional[int], Optional[int]]]:
+    """
+    Returns the publication with the id and version of its project's survey,
+    which are None if the project has no survey.
+    """
+    return (
+        db.query(models.Publication, models.Survey.id, models.Survey.version)
+        .outerjoin(
+            models.Survey, models.Survey.project_id == models.Publication.project_id
+        )
+        .filter(models.Publication.link_uuid == UUID(link_uuid))
+        .first()
+    )
+
+
+def get_publications(
+    db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100
+):
+    query = db.query(models.Publication)
+    return keyset(query, models.Publication.id, after_id, limit).all()
 
 
 def update_publication(
@@ -1,8 +1,10 @@
-from typing import Optional
+from itertools import chain
+from typing import Iterable, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session, selectinload
 
-from ..data.models import Survey
+from ..data.models import Item, ItemTemplate, Page, Survey, page_item_association
 from ..data import schemas
 
 
@@ -16,7 +18,12 @@ def create_survey(db: Session, survey: schemas.SurveyCreate) -> Survey:
 
 
 def get_survey(db: Session, survey_id: int) -> Optional[Survey]:
-    return db.query(Survey).filter(Survey.id == survey_id).first()
+    return (
+        db.query(Survey)
+        .options(selectinload(Survey.pages).selectinload(Page.items))
+        .filter(Survey.id == survey_id)
+        .first()
+    )
 
 
 def update_survey(
@@ -38,4 +45,59 @@ def delete_survey(db: Session, survey_id: int) -> bool:
         db.delete(db_survey)
         db.commit()
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def bump_survey_versions(db: Session, survey_ids: Iterable[Optional[int]]):
+    """
+    Increments the version of the surveys, invalidating their cached bundles.
+    Needs to be called for changes made with SQL statements, changes to ORM
+    objects are picked up on flush.
+    """
+    survey_ids = {survey_id for survey_id in survey_ids if survey_id is not None}
+    if survey_ids:
+        db.execute(
+            update(Survey.__table__)
+            .where(Survey.__table__.c.id.in_(survey_ids))
+            .values(version=Survey.__table__.c.version + 1)
+        )
+
+
+def _surveys_of_items(db: Session, item_filter) -> Iterable[int]:
+    return db.scalars(
+        select(Page.survey_id)
+        .join(page_item_association, page_item_association.c.page_id == Page.id)
+        .join(Item, Item.id == page_item_association.c.item_id)
+        .where(item_filter)
+        .distinct()
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def bump_versions_of_edited_surveys(session: Session, flush_context, instances):
+    survey_ids, item_ids, template_ids = set(), set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+
+        if isinstance(obj, Survey):
+            survey_ids.add(obj.id)
+        elif isinstance(obj, Page):
+            # a page moved to another survey changes both
+            history = inspect(obj).attrs.survey_id.history
+            survey_ids.update(history.added, history.unchanged, history.deleted)
+        elif isinstance(obj, Item):
+            item_ids.add(obj.id)
+        elif isinstance(obj, ItemTemplate):
+            template_ids.add(obj.id)
+
+    item_ids.discard(None)
+    if item_ids:
+        survey_ids.update(_surveys_of_items(session, Item.id.in_(item_ids)))
+    template_ids.discard(None)
+    if template_ids:
+        survey_ids.update(
+            _surveys_of_items(session, Item.template_id.in_(template_ids))
+        )
+
+    bump_survey_versions(session, survey_ids)
@@ -17,3 +17,9 @@ class QuestionType(StrEnum):
     SCALE = "scale"
     MATRIX_SCALE = "matrix_scale"
     LIKERT_SCALE = "likert_scale"
+
+
+# Events of a participant's visit of a survey page
+class PageEventType(StrEnum):
+    ENTER = "enter"
+    LEAVE = "leave"
@@ -8,24 +8,31 @@ from sqlalchemy import (
     Column,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
     Text,
     UniqueConstraint,
+    select,
 )
-from sqlalchemy.orm import declared_attr, relationship
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import column_property, declared_attr, relationship
 from sqlalchemy.sql import func
 
 from .database import DBDeclarativeBase as Base
 
+# JSON columns are stored as JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 # Association Table for Many-to-Many Relationship with Order
 page_item_association = Table(
     "page_item_association",
     Base.metadata,
     Column("page_id", Integer, ForeignKey("pages.id"), primary_key=True),
-    Column("item_id", Integer, ForeignKey("items.id"), primary_key=True),
+    Column("item_id", Integer, ForeignKey("items.id"), primary_key=True, index=True),
     Column("order", Integer, nullable=False),
 )
 
@@ -62,7 +69,7 @@ class Publication(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
     application_only = Column(Boolean, nullable=False, default=False)
     collect_data = Column(Boolean, nullable=False, default=False)
     link_uuid = Column(
@@ -72,6 +79,8 @@ class Publication(Base):
     end_date = Column(DateTime, nullable=True)
     redirect_url = Column(String, nullable=True)
     allow_anonymous = Column(Boolean, nullable=False, default=False)
+    # idle simulations kept ready for participants of this publication
+    warm_pool_size = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="publications")
 
@@ -88,7 +97,7 @@ class Application(Base):
     __tablename__ = "applications"
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, unique=True)
-    ros_version = Column(Enum("1", "2"), nullable=False)
+    ros_version = Column(Enum("1", "2", name="ros_version"), nullable=False)
     project = relationship("Project", back_populates="application")
     repo = relationship("Repo", back_populates="application", uselist=False,cascade="all, delete")
     containers = relationship("Container", back_populates="application", cascade="all, delete")
@@ -111,9 +120,14 @@ class Repo(Base):
 class Container(Base):
     __tablename__ = "containers"
     id = Column(Integer, primary_key=True)
-    application_id = Column(Integer, ForeignKey("applications.id", ondelete="CASCADE"), nullable=False)
+    application_id = Column(Integer, ForeignKey("applications.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     dockerfile = Column(String, nullable=False)
+    # Kubernetes quantities, the operator's defaults apply when none is set
+    cpu_request = Column(String)
+    cpu_limit = Column(String)
+    memory_request = Column(String)
+    memory_limit = Column(String)
     application = relationship("Application", back_populates="containers")
     ports = relationship("PortMap", back_populates="container", cascade="all, delete")
 
@@ -121,7 +135,7 @@ class Container(Base):
 class PortMap(Base):
     __tablename__ = "port_maps"
     id = Column(Integer, primary_key=True)
-    container_id = Column(Integer, ForeignKey("containers.id", ondelete="CASCADE"), nullable=False)
+    container_id = Column(Integer, ForeignKey("containers.id", ondelete="CASCADE"), nullable=False, index=True)
     internal_port = Column(Integer, nullable=False)
     external_port = Column(Integer)
     container = relationship("Container", back_populates="ports")
@@ -130,7 +144,7 @@ class PortMap(Base):
 class LogTopic(Base):
     __tablename__ = "log_topics"
     id = Column(Integer, primary_key=True)
-    application_id = Column(Integer, ForeignKey("applications.id", ondelete="CASCADE"), nullable=False)
+    application_id = Column(Integer, ForeignKey("applications.id", ondelete="CASCADE"), nullable=False, index=True)
     topic = Column(String, nullable=False)
     application = relationship("Application", back_populates="log_topics")
 
@@ -139,7 +153,7 @@ class ParticipantSurvey(Base):
     __tablename__ = "participant_surveys"
 
     id = Column(Integer, primary_key=True, index=True)
-    participant_id = Column(Integer, nullable=False)
+    participant_id = Column(Integer, nullable=False, index=True)
     survey_id = Column(Integer, nullable=False)
     start_time = Column(DateTime, default=func.now())
     submit_time = Column(DateTime, nullable=True)
@@ -156,11 +170,11 @@ class SurveyAnswer(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     participant_survey_id = Column(
-        Integer, ForeignKey("participant_surveys.id"), nullable=False
+        Integer, ForeignKey("participant_surveys.id"), nullable=False, index=True
     )
     item_id = Column(Integer, nullable=False)
     page_id = Column(Integer, nullable=False)
-    answer = Column(JSON, nullable=True)
+    answer = Column(JSONType, nullable=True)
     submit_time = Column(DateTime, default=func.now())
 
     participant_survey = relationship("ParticipantSurvey", back_populates="answers")
@@ -173,11 +187,11 @@ class ItemTemplate(Base):
     prompt = Column(Text, nullable=True)
     item_type = Column(String, nullable=False)
     question_type = Column(String, nullable=True)
-    options = Column(JSON, nullable=True)
+    options = Column(JSONType, nullable=True)
     scale_min = Column(Integer, nullable=True)
     scale_max = Column(Integer, nullable=True)
-    statements = Column(JSON, nullable=True)
-    matrix_options = Column(JSON, nullable=True)
+    statements = Column(JSONType, nullable=True)
+    matrix_options = Column(JSONType, nullable=True)
     image_url = Column(String, nullable=True)
     video_url = Column(String, nullable=True)
     text_content = Column(Text, nullable=True)
@@ -187,7 +201,9 @@ class Item(Base):
     __tablename__ = "items"
 
     id = Column(Integer, primary_key=True)
-    template_id = Column(Integer, ForeignKey("item_templates.id"), nullable=True)
+    template_id = Column(
+        Integer, ForeignKey("item_templates.id"), nullable=True, index=True
+    )
 
     pages = relationship(
         "Page", secondary=page_item_association, back_populates="items"
@@ -212,7 +228,7 @@ class Item(Base):
 
     @declared_attr
     def options(cls):
-        return Column(JSON, nullable=True)
+        return Column(JSONType, nullable=True)
 
     @declared_attr
     def scale_min(cls):
@@ -224,11 +240,11 @@ class Item(Base):
 
     @declared_attr
     def statements(cls):
-        return Column(JSON, nullable=True)
+        return Column(JSONType, nullable=True)
 
     @declared_attr
     def matrix_options(cls):
-        return Column(JSON, nullable=True)
+        return Column(JSONType, nullable=True)
 
     @declared_attr
     def image_url(cls):
@@ -244,26 +260,40 @@ class Item(Base):
 
     template = relationship("ItemTemplate")
 
-    def __getattribute__(self, name):
-        if name in (
-            "title",
-            "prompt",
-            "item_type",
-            "question_type",
-            "options",
-            "scale_min",
-            "scale_max",
-            "statements",
-            "matrix_options",
-            "image_url",
-            "video_url",
-            "text_content",
-        ):
-            value = super().__getattribute__(name)
-            if value is None:
-                return getattr(self.template, name)
-            return value
-        return super().__getattribute__(name)
+
+# Fields an Item inherits from its template where it has no own value
+ITEM_TEMPLATE_FIELDS = (
+    "title",
+    "prompt",
+    "item_type",
+    "question_type",
+    "options",
+    "scale_min",
+    "scale_max",
+    "statements",
+    "matrix_options",
+    "image_url",
+    "video_url",
+    "text_content",
+)
+
+# Item.resolved_<field> is the item's own value or else its template's, loaded
+# with the item in the same SELECT instead of lazily loading the template
+for _field in ITEM_TEMPLATE_FIELDS:
+    _column = Item.__table__.c[_field]
+    setattr(
+        Item,
+        f"resolved_{_field}",
+        column_property(
+            func.coalesce(
+                _column,
+                select(ItemTemplate.__table__.c[_field])
+                .where(ItemTemplate.id == Item.template_id)
+                .scalar_subquery(),
+                type_=_column.type,
+            )
+        ),
+    )
 
 
 class Survey(Base):
@@ -279,6 +309,8 @@ class Survey(Base):
     )
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, unique=True)
     project = relationship("Project", back_populates="survey")
+    # incremented whenever the survey, its pages or their items change
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class Page(Base):
@@ -299,14 +331,17 @@ class Page(Base):
     order = Column(Integer, nullable=False)
     answers = relationship("Answer", back_populates="page")
 
+    # pages are always listed per survey in order
+    __table_args__ = (Index("ix_pages_survey_order", "survey_id", "order"),)
+
 
 class Answer(Base):
     __tablename__ = "answers"
     id = Column(Integer, primary_key=True, index=True)
     participant_id = Column(Integer, ForeignKey("participants.id"), nullable=False)
-    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
-    page_id = Column(Integer, ForeignKey("pages.id"), nullable=False)
-    value = Column(JSON, nullable=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False, index=True)
+    page_id = Column(Integer, ForeignKey("pages.id"), nullable=False, index=True)
+    value = Column(JSONType, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), onupdate=func.now(), server_default=func.now()
@@ -316,6 +351,62 @@ class Answer(Base):
     participant = relationship("Participant", back_populates="answers")
     item = relationship("Item", back_populates="answers")
 
+    # one answer per participant and item, edits update it in place. Also
+    # serves lookups by participant_id alone, so that column has no own index.
+    __table_args__ = (
+        Index(
+            "ix_answers_participant_item", "participant_id", "item_id", unique=True
+        ),
+    )
+
+
+class PageEvent(Base):
+    """
+    Append-only log of participants entering and leaving survey pages, written
+    in batches by utils.event_writer.
+    """
+
+    __tablename__ = "page_events"
+    id = Column(Integer, primary_key=True)
+    participant_id = Column(Integer, nullable=False)
+    page_id = Column(Integer, nullable=False, index=True)
+    event = Column(Enum("enter", "leave", name="page_event_type"), nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+
+
+class AnswerAggregate(Base):
+    """
+    Number, sum and sum of squares of the answers per page, item and value
+    bucket, kept up to date by the answer CRUD functions so statistics don't
+    have to scan the answers.
+    """
+
+    __tablename__ = "answer_aggregates"
+    page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True, index=True)
+    # the JSON encoded answer value, or "" for items whose values aren't counted
+    bucket = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0)
+    value_sum_squares = Column(Float, nullable=False, default=0)
+
+
+class KubernetesOutbox(Base):
+    """
+    Projects whose Survey custom object (and repo secret) must be written to
+    the cluster, enqueued in the transaction that changed them and worked off
+    by the reconciler in k8s_sync.
+    """
+
+    __tablename__ = "kubernetes_outbox"
+    # not a foreign key, the row of a deleted project is dropped by the reconciler
+    project_id = Column(Integer, primary_key=True, autoincrement=False)
+    sync_secret = Column(Boolean, nullable=False, default=False)
+    # incremented by every change, a row changed while syncing is kept
+    version = Column(Integer, nullable=False, default=1)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
 
 class User(Base):
     __tablename__ = "users"
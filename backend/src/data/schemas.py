@@ -2,9 +2,17 @@ from datetime import datetime
 from typing import Any, List, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, Field
+from kubernetes.utils import parse_quantity
+from pydantic import (
+    AliasChoices,
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+)
 
-from .enums import ItemType, QuestionType
+from .enums import ItemType, PageEventType, QuestionType
 
 
 class ProjectBase(BaseModel):
@@ -78,6 +86,10 @@ class PortMapping(BaseModel):
     external_port: Optional[int] = Field(gt=0, description="Host port must be a positive integer", default=None)
 
 
+CPU_QUANTITY_PATTERN = r"^([0-9]+(\.[0-9]+)?|[0-9]+m)$"
+MEMORY_QUANTITY_PATTERN = r"^[0-9]+(\.[0-9]+)?([KMGTPE]i?)?$"
+
+
 class ContainerFormSchema(BaseModel):
     id: Optional[int] = None
     name: str = Field(..., min_length=1, description="Name is required")
@@ -85,6 +97,29 @@ class ContainerFormSchema(BaseModel):
         ..., min_length=1, description="Dockerfile path is required"
     )
     ports: List[PortMapping] = []
+    # Kubernetes quantities, e.g. "500m" CPU and "512Mi" memory. Requests equal
+    # to the limits give the simulation the Guaranteed QoS class.
+    cpu_request: Optional[str] = Field(None, pattern=CPU_QUANTITY_PATTERN)
+    cpu_limit: Optional[str] = Field(None, pattern=CPU_QUANTITY_PATTERN)
+    memory_request: Optional[str] = Field(None, pattern=MEMORY_QUANTITY_PATTERN)
+    memory_limit: Optional[str] = Field(None, pattern=MEMORY_QUANTITY_PATTERN)
+
+    @field_validator(
+        "cpu_request", "cpu_limit", "memory_request", "memory_limit", mode="before"
+    )
+    @classmethod
+    def empty_as_unset(cls, value):
+        return value or None
+
+    @model_validator(mode="after")
+    def requests_within_limits(self):
+        for request, limit in (
+            (self.cpu_request, self.cpu_limit),
+            (self.memory_request, self.memory_limit),
+        ):
+            if request and limit and parse_quantity(request) > parse_quantity(limit):
+                raise ValueError(f"Request {request} exceeds the limit {limit}")
+        return self
 
 
 class ContainerCreate(ContainerFormSchema):
@@ -95,6 +130,10 @@ class ContainerBase(BaseModel):
     name: str
     dockerfile: str
     ports: Optional[List[PortMapping]]
+    cpu_request: Optional[str] = None
+    cpu_limit: Optional[str] = None
+    memory_request: Optional[str] = None
+    memory_limit: Optional[str] = None
 
 
 class Container(ContainerBase):
@@ -141,6 +180,7 @@ class PublicationBase(BaseModel):
     collect_data: bool
     redirect_url: Optional[str] = None
     allow_anonymous: bool
+    warm_pool_size: int = Field(0, ge=0)  # idle simulations kept ready
 
 
 class PublicationCreate(PublicationBase):
@@ -155,6 +195,7 @@ class PublicationUpdate(BaseModel):
     collect_data: Optional[bool] = None
     redirect_url: Optional[str] = None
     allow_anonymous: Optional[bool] = None
+    warm_pool_size: Optional[int] = Field(None, ge=0)
 
 
 class Publication(PublicationBase):
@@ -215,18 +256,29 @@ class ItemUpdate(ItemBase):
     text_content: Optional[str] = None
 
 
+def _resolved(name: str, *args):
+    """
+    Reads the field from models.Item.resolved_<name>, the item's own value or
+    else its template's, and from <name> for other objects.
+    """
+    return Field(*args, validation_alias=AliasChoices(f"resolved_{name}", name))
+
+
 # Full schema for an item, used for reading
 class Item(ItemBase):
     id: int
-    question_type: Optional[QuestionType] = None
-    options: Optional[List[str]] = None
-    scale_min: Optional[int] = None
-    scale_max: Optional[int] = None
-    statements: Optional[List[str]] = None
-    matrix_options: Optional[List[str]] = None
-    image_url: Optional[str] = None
-    video_url: Optional[str] = None
-    text_content: Optional[str] = None
+    title: Optional[str] = _resolved("title", None)
+    prompt: Optional[str] = _resolved("prompt", None)
+    item_type: ItemType = _resolved("item_type")
+    question_type: Optional[QuestionType] = _resolved("question_type", None)
+    options: Optional[List[str]] = _resolved("options", None)
+    scale_min: Optional[int] = _resolved("scale_min", None)
+    scale_max: Optional[int] = _resolved("scale_max", None)
+    statements: Optional[List[str]] = _resolved("statements", None)
+    matrix_options: Optional[List[str]] = _resolved("matrix_options", None)
+    image_url: Optional[str] = _resolved("image_url", None)
+    video_url: Optional[str] = _resolved("video_url", None)
+    text_content: Optional[str] = _resolved("text_content", None)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -319,18 +371,18 @@ class ParticipantSurvey(BaseModel):
 
 class ItemResponse(BaseModel):
     id: int
-    title: Optional[str]
-    prompt: Optional[str]
-    item_type: Optional[str]
-    question_type: Optional[str]
-    options: Optional[List[str]]
-    scale_min: Optional[int]
-    scale_max: Optional[int]
-    statements: Optional[List[str]]
-    matrix_options: Optional[List[str]]
-    image_url: Optional[str]
-    video_url: Optional[str]
-    text_content: Optional[str]
+    title: Optional[str] = _resolved("title")
+    prompt: Optional[str] = _resolved("prompt")
+    item_type: Optional[str] = _resolved("item_type")
+    question_type: Optional[str] = _resolved("question_type")
+    options: Optional[List[str]] = _resolved("options")
+    scale_min: Optional[int] = _resolved("scale_min")
+    scale_max: Optional[int] = _resolved("scale_max")
+    statements: Optional[List[str]] = _resolved("statements")
+    matrix_options: Optional[List[str]] = _resolved("matrix_options")
+    image_url: Optional[str] = _resolved("image_url")
+    video_url: Optional[str] = _resolved("video_url")
+    text_content: Optional[str] = _resolved("text_content")
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -373,12 +425,87 @@ class Answer(AnswerBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schemas for submitting all answers of a page at once
+class PageAnswer(BaseModel):
+    item_id: int
+    value: Any
+
+
+class PageAnswerResult(BaseModel):
+    id: int
+    item_id: int
+
+
 class SurveyBase(BaseModel):
     title: str
     description: Optional[str] = None
     project_id: int
 
 
+# Schemas for the aggregate statistics of a survey
+class ValueCount(BaseModel):
+    value: Any
+    count: int
+
+
+class NumericStats(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    sd: Optional[float] = None  # sample standard deviation
+    histogram: List[ValueCount] = []
+
+
+class ItemStats(BaseModel):
+    item_id: int
+    title: Optional[str] = None
+    question_type: Optional[str] = None
+    responses: int
+    numeric: Optional[NumericStats] = None  # scale and likert items
+    statements: Optional[List[NumericStats]] = None  # matrix scale items
+    options: Optional[List[ValueCount]] = None  # multiple choice items
+
+
+class PageFunnelStep(BaseModel):
+    page_id: int
+    name: str
+    order: int
+    reached: int  # participants who answered on this or a later page
+    answered: int  # participants who answered on this page
+    dropped: int  # participants whose last answered page this is
+
+
+class SurveyStats(BaseModel):
+    survey_id: int
+    participants: int
+    submitted: int
+    items: List[ItemStats]
+    funnel: List[PageFunnelStep]
+
+
+class PageEventCreate(BaseModel):
+    page_id: int
+    event: PageEventType
+    timestamp: Optional[datetime] = None  # time of receipt if not given
+
+
+class PageProgress(BaseModel):
+    page_id: int
+    name: str
+    order: int
+    visitors: int  # participants who entered the page
+    visits: int
+    mean_dwell_seconds: Optional[float] = None
+    median_dwell_seconds: Optional[float] = None
+    dropped: int  # participants whose last event is on this page
+
+
+class SurveyProgress(BaseModel):
+    survey_id: int
+    participants: int
+    completed: int  # participants who left the last page
+    pages: List[PageProgress]
+
+
 class Survey(SurveyBase):
     id: int
     pages: List[Page] = []
@@ -0,0 +1,76 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from ..data.database import engine_db
+
+MIGRATIONS_PATH = Path(__file__).resolve().parent.parent / "migrations"
+
+# revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+# Seconds between checks while waiting for the migration job
+WAIT_INTERVAL = 5
+
+
+def _alembic_config() -> Config:
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", str(MIGRATIONS_PATH))
+    return alembic_config
+
+
+def migrate():
+    """
+    Upgrades the database to the latest revision. Databases created by
+    create_all before migrations were introduced are stamped with the
+    baseline revision first.
+    """
+    alembic_config = _alembic_config()
+
+    table_names = inspect(engine_db).get_table_names()
+    if table_names and "alembic_version" not in table_names:
+        logging.info(f"Stamping existing database with revision {BASELINE_REVISION}")
+        command.stamp(alembic_config, BASELINE_REVISION)
+
+    command.upgrade(alembic_config, "head")
+
+
+def wait_for_migrations():
+    """
+    Returns once the database is at the latest revision, so the backend only
+    starts after the migration job upgraded the schema.
+    """
+    heads = set(ScriptDirectory.from_config(_alembic_config()).get_heads())
+    while True:
+        try:
+            with engine_db.connect() as connection:
+                context = MigrationContext.configure(connection)
+                current = set(context.get_current_heads())
+        except Exception as e:
+            # the database may not accept connections yet
+            logging.info(f"Database not ready: {str(e)}")
+            current = set()
+        if current == heads:
+            return
+        logging.info(f"Waiting for migrations, at {current or 'no revision'}")
+        time.sleep(WAIT_INTERVAL)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migrate the database schema")
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="only wait until another process migrated the database",
+    )
+    if parser.parse_args().wait:
+        wait_for_migrations()
+    else:
+        migrate()
@@ -0,0 +1,36 @@
+import argparse
+import logging
+
+from sqlalchemy import select
+
+from ..crud.answer_aggregates import rebuild_answer_aggregates
+from ..data.database import SessionLocalSurveyDesign
+from ..data.models import Answer, AnswerAggregate
+
+
+def rebuild_aggregates(if_empty: bool = False):
+    """
+    Recounts the answer aggregates from the answers. With if_empty, only if
+    there are answers but no aggregates yet, as after upgrading a database
+    that has answers from before the aggregates existed.
+    """
+    with SessionLocalSurveyDesign() as db:
+        if if_empty and (
+            db.scalar(select(AnswerAggregate.item_id).limit(1)) is not None
+            or db.scalar(select(Answer.id).limit(1)) is None
+        ):
+            logging.info("Answer aggregates are up to date")
+            return
+        logging.info("Rebuilding answer aggregates")
+        rebuild_answer_aggregates(db)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild the answer aggregates")
+    parser.add_argument(
+        "--if-empty",
+        action="store_true",
+        help="only rebuild if there are answers but no aggregates",
+    )
+    rebuild_aggregates(parser.parse_args().if_empty)
@@ -1,21 +1,37 @@
 import base64
 import logging
 import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 
-from kubernetes import client, config
-from sqlalchemy import event
-from sqlalchemy.orm import Session, object_session
+from kubernetes import client
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from .data import models
+from .data.database import SessionLocalSurveyDesign
+from .utils.kubernetes import call_k8s, core_api, custom_api
 
-if os.getenv("KUBERNETES_PORT"):
-    config.load_incluster_config()
-else:
-    config.load_kube_config()
+# Seconds changes to a project are collected before its Survey object is written
+K8S_SYNC_DELAY = float(os.getenv("K8S_SYNC_DELAY") or 1)
+# Seconds before the first retry of a failed write, doubled for every retry
+K8S_SYNC_RETRY_DELAY = float(os.getenv("K8S_SYNC_RETRY_DELAY") or 5)
+K8S_SYNC_MAX_RETRY_DELAY = float(os.getenv("K8S_SYNC_MAX_RETRY_DELAY") or 300)
+# Seconds between checks for rows queued by other processes
+K8S_SYNC_POLL_INTERVAL = float(os.getenv("K8S_SYNC_POLL_INTERVAL") or 10)
 
-api_client = client.ApiClient()
-custom_api = client.CustomObjectsApi(api_client)
-v1 = client.CoreV1Api()
+# Models the Survey custom object of a project is built from
+SYNCED_MODELS = (
+    models.Project,
+    models.Application,
+    models.Repo,
+    models.Container,
+    models.PortMap,
+    models.LogTopic,
+    models.Publication,
+)
 
 
 # TODO: use survey template
@@ -51,8 +67,25 @@ v1 = client.CoreV1Api()
 # survey_obj = yaml.safe_load(survey_yaml)
 # # might automatically cast to int
 # survey_obj["spec"]["rosVersion"] = str(survey_obj["spec"]["rosVersion"])
+def container_resources(container: models.Container):
+    """The container's requests and limits, empty ones use the operator's defaults."""
+    resources = {
+        "requests": {"cpu": container.cpu_request, "memory": container.memory_request},
+        "limits": {"cpu": container.cpu_limit, "memory": container.memory_limit},
+    }
+    resources = {
+        kind: {name: value for name, value in values.items() if value}
+        for kind, values in resources.items()
+    }
+    return {kind: values for kind, values in resources.items() if values}
+
+
 def update_kubernetes_crd(project: models.Project):
-    if not project.application.repo or not project.application.containers:
+    if (
+        not project.application
+        or not project.application.repo
+        or not project.application.containers
+    ):
         logging.info(
             f"Skipping CRD creation for project {project.name}: Missing repo or containers"
         )
@@ -80,16 +113,22 @@ def update_kubernetes_crd(project: models.Project):
                         }
                         for port_map in container.ports
                     ],
+                    "resources": container_resources(container),
                 }
                 for container in project.application.containers
             ],
             "rosVersion": project.application.ros_version,
             "rosbagTopics": [topic.topic for topic in project.application.log_topics],
+            "warmPoolSize": max(
+                (publication.warm_pool_size for publication in project.publications),
+                default=0,
+            ),
         },
     }
 
     try:
-        custom_api.patch_cluster_custom_object(
+        call_k8s(
+            custom_api.patch_cluster_custom_object,
             group="example.com",
             version="v1",
             plural="surveys",
@@ -99,7 +138,8 @@ def update_kubernetes_crd(project: models.Project):
         logging.info(f"Updated CRD for project {project.name}")
     except client.ApiException as e:
         if e.status == 404:
-            custom_api.create_cluster_custom_object(
+            call_k8s(
+                custom_api.create_cluster_custom_object,
                 group="example.com",
                 version="v1",
                 plural="surveys",
@@ -125,14 +165,21 @@ def update_kubernetes_secret(repo: models.Repo):
     )
 
     try:
-        v1.read_namespaced_secret(name=secret_name, namespace=namespace)
+        call_k8s(core_api.read_namespaced_secret, name=secret_name, namespace=namespace)
         # Secret exists, update it
-        v1.patch_namespaced_secret(name=secret_name, namespace=namespace, body=secret)
+        call_k8s(
+            core_api.patch_namespaced_secret,
+            name=secret_name,
+            namespace=namespace,
+            body=secret,
+        )
         logging.info(f"Updated Secret {secret_name} for repo {repo.id}")
     except client.ApiException as e:
         if e.status == 404:
             # Secret doesn't exist, create it
-            v1.create_namespaced_secret(namespace=namespace, body=secret)
+            call_k8s(
+                core_api.create_namespaced_secret, namespace=namespace, body=secret
+            )
             logging.info(f"Created new Secret {secret_name} for repo {repo.id}")
         else:
             logging.error(
@@ -141,54 +188,183 @@ def update_kubernetes_secret(repo: models.Repo):
             raise
 
 
-@event.listens_for(models.Repo.access_token, "set")
-def receive_set(target, value, oldvalue, initiator):
-    session = object_session(target)
-    if session:
-        update_kubernetes_secret(target)
-
-
-@event.listens_for(models.Project, "after_update")
-@event.listens_for(models.Application, "after_update")
-@event.listens_for(models.Repo, "after_update")
-@event.listens_for(models.Container, "after_update")
-@event.listens_for(models.PortMap, "after_update")
-@event.listens_for(models.LogTopic, "after_update")
-def receive_after_update(mapper, connection, target):
-    session = Session(bind=connection)
-    project = None
-    if isinstance(target, models.Project):
-        project = target
-    elif isinstance(target, models.Application):
-        project = target.project
-    elif isinstance(target, models.Repo):
-        project = target.application.project
-    elif isinstance(target, models.Container):
-        project = target.application.project
-    elif isinstance(target, models.LogTopic):
-        project = target.application.project
-
-    if project:
+def _project_id_of(session: Session, obj) -> Optional[int]:
+    """Project of a changed object, from its foreign keys as it may be deleted."""
+    if isinstance(obj, models.Project):
+        return obj.id
+    if isinstance(obj, (models.Application, models.Publication)):
+        return obj.project_id
+    if isinstance(obj, (models.Repo, models.Container, models.LogTopic)):
+        application_id = obj.application_id
+    elif isinstance(obj, models.PortMap):
+        application_id = session.scalar(
+            select(models.Container.application_id).where(
+                models.Container.id == obj.container_id
+            )
+        )
+    else:
+        return None
+    return session.scalar(
+        select(models.Application.project_id).where(
+            models.Application.id == application_id
+        )
+    )
+
+
+def _enqueue(session: Session, projects: Dict[int, bool]):
+    """Adds the projects to the outbox, or marks their rows as changed again."""
+    if session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql.insert(models.KubernetesOutbox)
+    else:
+        stmt = sqlite.insert(models.KubernetesOutbox)
+    # a queued row keeps its due time, so changes within the delay are coalesced
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.KubernetesOutbox.project_id],
+        set_={
+            "sync_secret": models.KubernetesOutbox.sync_secret
+            | stmt.excluded.sync_secret,
+            "version": models.KubernetesOutbox.version + 1,
+        },
+    )
+    due = datetime.now(timezone.utc) + timedelta(seconds=K8S_SYNC_DELAY)
+    session.execute(
+        stmt,
+        [
+            {
+                "project_id": project_id,
+                "sync_secret": sync_secret,
+                "version": 1,
+                "attempts": 0,
+                "next_attempt_at": due,
+            }
+            for project_id, sync_secret in projects.items()
+        ],
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def receive_after_flush(session: Session, flush_context):
+    projects: Dict[int, bool] = {}
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+    ]
+    for obj in changed:
+        if not isinstance(obj, SYNCED_MODELS):
+            continue
+        project_id = _project_id_of(session, obj)
+        if project_id is None:
+            continue
+        sync_secret = isinstance(obj, models.Repo) and (
+            obj in session.new
+            or inspect(obj).attrs.access_token.history.has_changes()
+        )
+        projects[project_id] = projects.get(project_id, False) or sync_secret
+    if projects:
+        _enqueue(session, projects)
+        session.info["kubernetes_outbox"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def receive_after_commit(session: Session):
+    if session.info.pop("kubernetes_outbox", False):
+        reconciler.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def receive_after_soft_rollback(session: Session, previous_transaction):
+    session.info.pop("kubernetes_outbox", None)
+
+
+class KubernetesReconciler:
+    """
+    Works off the outbox in a background thread: writes the Survey custom
+    object of each queued project once, however many changes were queued for
+    it, and retries failed writes with exponential backoff.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self):
+        self._wake.set()
+
+    def _sync(self, db: Session, row: models.KubernetesOutbox):
+        project = db.get(models.Project, row.project_id)
+        if project is None:
+            return
+        repo = project.application.repo if project.application else None
+        if row.sync_secret and repo is not None and repo.access_token:
+            update_kubernetes_secret(repo)
         update_kubernetes_crd(project)
-    session.close()
-
-
-@event.listens_for(models.Application, "after_insert")
-@event.listens_for(models.Repo, "after_insert")
-@event.listens_for(models.Container, "after_insert")
-@event.listens_for(models.PortMap, "after_insert")
-@event.listens_for(models.LogTopic, "after_insert")
-def receive_after_insert(mapper, connection, target):
-    if isinstance(target, models.Repo):
-        update_kubernetes_secret(target)
-    receive_after_update(mapper, connection, target)
-
-
-@event.listens_for(models.Project, "after_delete")
-@event.listens_for(models.Application, "after_delete")
-@event.listens_for(models.Repo, "after_delete")
-@event.listens_for(models.Container, "after_delete")
-@event.listens_for(models.PortMap, "after_delete")
-@event.listens_for(models.LogTopic, "after_delete")
-def receive_after_delete(mapper, connection, target):
-    receive_after_update(mapper, connection, target)
+
+    def reconcile(self) -> Optional[datetime]:
+        """Syncs the projects that are due and returns when the next one is."""
+        outbox = models.KubernetesOutbox
+        with SessionLocalSurveyDesign() as db:
+            rows = db.scalars(
+                select(outbox)
+                .where(outbox.next_attempt_at <= datetime.now(timezone.utc))
+                .order_by(outbox.next_attempt_at)
+            ).all()
+            db.expunge_all()
+            for row in rows:
+                current = (outbox.project_id == row.project_id) & (
+                    outbox.version == row.version
+                )
+                try:
+                    self._sync(db, row)
+                    db.execute(delete(outbox).where(current))
+                except Exception as e:
+                    logging.error(f"Syncing project {row.project_id} failed: {e}")
+                    db.rollback()
+                    delay = min(
+                        K8S_SYNC_RETRY_DELAY * 2**row.attempts, K8S_SYNC_MAX_RETRY_DELAY
+                    )
+                    db.execute(
+                        update(outbox)
+                        .where(current)
+                        .values(
+                            attempts=row.attempts + 1,
+                            next_attempt_at=datetime.now(timezone.utc)
+                            + timedelta(seconds=delay),
+                        )
+                    )
+                # a row changed meanwhile stays queued with its new version
+                db.commit()
+                db.expunge_all()
+            return db.scalar(select(func.min(outbox.next_attempt_at)))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                next_at = self.reconcile()
+            except Exception as e:
+                logging.error(f"Reconciling the Kubernetes outbox failed: {e}")
+                next_at = None
+            timeout = K8S_SYNC_POLL_INTERVAL
+            if next_at is not None:
+                if next_at.tzinfo is None:  # SQLite
+                    next_at = next_at.replace(tzinfo=timezone.utc)
+                wait = (next_at - datetime.now(timezone.utc)).total_seconds()
+                timeout = min(max(wait, 0), timeout)
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="kubernetes-reconciler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+reconciler = KubernetesReconciler()
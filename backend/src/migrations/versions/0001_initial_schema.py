@@ -0,0 +1,270 @@
+"""initial schema
+
+The schema as created by Base.metadata.create_all before migrations were
+introduced. Databases created that way are stamped with this revision.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 19:32:46.521632
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('item_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('prompt', sa.Text(), nullable=True),
+    sa.Column('item_type', sa.String(), nullable=False),
+    sa.Column('question_type', sa.String(), nullable=True),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('scale_min', sa.Integer(), nullable=True),
+    sa.Column('scale_max', sa.Integer(), nullable=True),
+    sa.Column('statements', sa.JSON(), nullable=True),
+    sa.Column('matrix_options', sa.JSON(), nullable=True),
+    sa.Column('image_url', sa.String(), nullable=True),
+    sa.Column('video_url', sa.String(), nullable=True),
+    sa.Column('text_content', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('item_templates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_item_templates_id'), ['id'], unique=False)
+
+    op.create_table('participant_surveys',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('participant_id', sa.Integer(), nullable=False),
+    sa.Column('survey_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('submit_time', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('participant_surveys', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_participant_surveys_id'), ['id'], unique=False)
+
+    op.create_table('participants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('external_id', sa.String(), nullable=True),
+    sa.Column('external_survey_id', sa.String(), nullable=True),
+    sa.Column('external_session_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('external_id', 'external_survey_id', 'external_session_id', name='uq_participant_external_fields')
+    )
+    with op.batch_alter_table('participants', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_participants_id'), ['id'], unique=False)
+
+    op.create_table('projects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    op.create_table('applications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('ros_version', sa.Enum('1', '2', name='ros_version'), nullable=False),
+    sa.Column('build_version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('project_id')
+    )
+    op.create_table('items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('prompt', sa.Text(), nullable=True),
+    sa.Column('item_type', sa.String(), nullable=True),
+    sa.Column('question_type', sa.String(), nullable=True),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('scale_min', sa.Integer(), nullable=True),
+    sa.Column('scale_max', sa.Integer(), nullable=True),
+    sa.Column('statements', sa.JSON(), nullable=True),
+    sa.Column('matrix_options', sa.JSON(), nullable=True),
+    sa.Column('image_url', sa.String(), nullable=True),
+    sa.Column('video_url', sa.String(), nullable=True),
+    sa.Column('text_content', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['template_id'], ['item_templates.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('publications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('application_only', sa.Boolean(), nullable=False),
+    sa.Column('collect_data', sa.Boolean(), nullable=False),
+    sa.Column('link_uuid', sa.UUID(), nullable=False),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=True),
+    sa.Column('redirect_url', sa.String(), nullable=True),
+    sa.Column('allow_anonymous', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('link_uuid')
+    )
+    op.create_table('survey_answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('participant_survey_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('answer', sa.JSON(), nullable=True),
+    sa.Column('submit_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['participant_survey_id'], ['participant_surveys.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('survey_answers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_survey_answers_id'), ['id'], unique=False)
+
+    op.create_table('surveys',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('project_id')
+    )
+    with op.batch_alter_table('surveys', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_surveys_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_surveys_title'), ['title'], unique=False)
+
+    op.create_table('containers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('application_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('dockerfile', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('log_topics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('application_id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('pages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('survey_id', sa.Integer(), nullable=True),
+    sa.Column('back_button_disabled', sa.Boolean(), nullable=False),
+    sa.Column('application_enabled', sa.Boolean(), nullable=False),
+    sa.Column('order', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('pages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pages_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pages_name'), ['name'], unique=False)
+
+    op.create_table('repos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('application_id', sa.Integer(), nullable=False),
+    sa.Column('git_url', sa.String(), nullable=False),
+    sa.Column('git_branch', sa.String(), nullable=False),
+    sa.Column('access_token', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('application_id')
+    )
+    op.create_table('answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('participant_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ),
+    sa.ForeignKeyConstraint(['participant_id'], ['participants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_answers_id'), ['id'], unique=False)
+
+    op.create_table('page_item_association',
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('order', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ),
+    sa.PrimaryKeyConstraint('page_id', 'item_id')
+    )
+    op.create_table('port_maps',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('container_id', sa.Integer(), nullable=False),
+    sa.Column('internal_port', sa.Integer(), nullable=False),
+    sa.Column('external_port', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['container_id'], ['containers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('port_maps')
+    op.drop_table('page_item_association')
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_answers_id'))
+
+    op.drop_table('answers')
+    op.drop_table('repos')
+    with op.batch_alter_table('pages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pages_name'))
+        batch_op.drop_index(batch_op.f('ix_pages_id'))
+
+    op.drop_table('pages')
+    op.drop_table('log_topics')
+    op.drop_table('containers')
+    with op.batch_alter_table('surveys', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_surveys_title'))
+        batch_op.drop_index(batch_op.f('ix_surveys_id'))
+
+    op.drop_table('surveys')
+    with op.batch_alter_table('survey_answers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_survey_answers_id'))
+
+    op.drop_table('survey_answers')
+    op.drop_table('publications')
+    op.drop_table('items')
+    op.drop_table('applications')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+
+    op.drop_table('users')
+    op.drop_table('projects')
+    with op.batch_alter_table('participants', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_participants_id'))
+
+    op.drop_table('participants')
+    with op.batch_alter_table('participant_surveys', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_participant_surveys_id'))
+
+    op.drop_table('participant_surveys')
+    with op.batch_alter_table('item_templates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_item_templates_id'))
+
+    op.drop_table('item_templates')
@@ -0,0 +1,51 @@
+"""unique answer per participant and item
+
+Keeps only the latest answer per participant and item and enforces that with
+a unique index, so answers can be upserted.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 19:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    answers = sa.table(
+        'answers',
+        sa.column('id', sa.Integer),
+        sa.column('participant_id', sa.Integer),
+        sa.column('item_id', sa.Integer),
+        sa.column('updated_at', sa.DateTime),
+    )
+    ranked = sa.select(
+        answers.c.id,
+        sa.func.row_number()
+        .over(
+            partition_by=(answers.c.participant_id, answers.c.item_id),
+            order_by=(answers.c.updated_at.desc(), answers.c.id.desc()),
+        )
+        .label('rank'),
+    ).subquery()
+    op.execute(
+        answers.delete().where(
+            answers.c.id.in_(sa.select(ranked.c.id).where(ranked.c.rank > 1))
+        )
+    )
+
+    op.create_index('ix_answers_participant_item', 'answers', ['participant_id', 'item_id'], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_answers_participant_item', table_name='answers')
@@ -0,0 +1,43 @@
+"""foreign key indexes
+
+Indexes the foreign keys the CRUD functions filter and join on.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:44:57.902611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_page_item_association_item_id', 'page_item_association', ['item_id']),
+    ('ix_publications_project_id', 'publications', ['project_id']),
+    ('ix_containers_application_id', 'containers', ['application_id']),
+    ('ix_port_maps_container_id', 'port_maps', ['container_id']),
+    ('ix_log_topics_application_id', 'log_topics', ['application_id']),
+    ('ix_answers_item_id', 'answers', ['item_id']),
+    ('ix_answers_page_id', 'answers', ['page_id']),
+    ('ix_participant_surveys_participant_id', 'participant_surveys', ['participant_id']),
+    ('ix_survey_answers_participant_survey_id', 'survey_answers', ['participant_survey_id']),
+    ('ix_items_template_id', 'items', ['template_id']),
+    ('ix_pages_survey_order', 'pages', ['survey_id', 'order']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,49 @@
+"""jsonb columns
+
+Stores the JSON columns as JSONB on PostgreSQL. SQLite has no separate JSON
+storage, so nothing changes there.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:21:08.114730
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = [
+    ('item_templates', 'options'),
+    ('item_templates', 'statements'),
+    ('item_templates', 'matrix_options'),
+    ('items', 'options'),
+    ('items', 'statements'),
+    ('items', 'matrix_options'),
+    ('survey_answers', 'answer'),
+    ('answers', 'value'),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), existing_type=sa.JSON(), postgresql_using=f'{column}::jsonb')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=sa.JSON(), existing_type=postgresql.JSONB(), postgresql_using=f'{column}::json')
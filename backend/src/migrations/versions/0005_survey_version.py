@@ -0,0 +1,31 @@
+"""survey version
+
+Counts changes to a survey and its pages and items, so cached survey bundles
+can be invalidated.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 21:02:37.560918
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('surveys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('surveys', schema=None) as batch_op:
+        batch_op.drop_column('version')
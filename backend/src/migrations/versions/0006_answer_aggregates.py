@@ -0,0 +1,42 @@
+"""answer aggregates
+
+Running per page, item and value counts of the answers for the survey
+statistics. Existing answers are counted by python -m
+src.jobs.rebuild_aggregates.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 23:14:05.218337
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('answer_aggregates',
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.Column('value_sum_squares', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ),
+    sa.PrimaryKeyConstraint('page_id', 'item_id', 'bucket')
+    )
+    op.create_index(op.f('ix_answer_aggregates_item_id'), 'answer_aggregates', ['item_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_answer_aggregates_item_id'), table_name='answer_aggregates')
+    op.drop_table('answer_aggregates')
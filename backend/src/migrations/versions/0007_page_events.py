@@ -0,0 +1,39 @@
+"""page events
+
+Log of participants entering and leaving survey pages, for dwell time and
+dropout per page.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:41:27.093614
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('page_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('participant_id', sa.Integer(), nullable=False),
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('event', sa.Enum('enter', 'leave', name='page_event_type'), nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_page_events_page_id'), 'page_events', ['page_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_page_events_page_id'), table_name='page_events')
+    op.drop_table('page_events')
+    sa.Enum(name='page_event_type').drop(op.get_bind(), checkfirst=True)
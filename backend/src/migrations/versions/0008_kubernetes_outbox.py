@@ -0,0 +1,38 @@
+"""kubernetes outbox
+
+Projects whose Survey custom object must be written to the cluster, worked
+off by a reconciler instead of patching inside the flush.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 09:12:44.518302
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('kubernetes_outbox',
+    sa.Column('project_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sync_secret', sa.Boolean(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+    op.create_index(op.f('ix_kubernetes_outbox_next_attempt_at'), 'kubernetes_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_kubernetes_outbox_next_attempt_at'), table_name='kubernetes_outbox')
+    op.drop_table('kubernetes_outbox')
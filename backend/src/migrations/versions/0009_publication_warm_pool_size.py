@@ -0,0 +1,31 @@
+"""publication warm pool size
+
+Number of idle simulations the operator keeps ready for the participants of
+a publication.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 11:37:05.204716
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('publications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('warm_pool_size', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('publications', schema=None) as batch_op:
+        batch_op.drop_column('warm_pool_size')
@@ -0,0 +1,36 @@
+"""container resources
+
+CPU and memory requests and limits of each container of an application.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 15:02:41.518372
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('containers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cpu_request', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('cpu_limit', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('memory_request', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('memory_limit', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('containers', schema=None) as batch_op:
+        batch_op.drop_column('memory_limit')
+        batch_op.drop_column('memory_request')
+        batch_op.drop_column('cpu_limit')
+        batch_op.drop_column('cpu_request')
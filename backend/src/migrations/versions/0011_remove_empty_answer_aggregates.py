@@ -0,0 +1,31 @@
+"""remove empty answer aggregates
+
+Aggregates whose answers were all removed were kept with a count of 0 and
+kept their page and item from being deleted.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-20 09:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    answer_aggregates = sa.table('answer_aggregates', sa.column('count', sa.Integer))
+    op.execute(answer_aggregates.delete().where(answer_aggregates.c.count <= 0))
+
+
+def downgrade() -> None:
+    # the removed rows held no answers
+    pass
@@ -11,7 +11,7 @@ router = APIRouter()
 
 
 @router.post("/applications/{application_id}/deploy")
-async def deploy_application(
+def deploy_application(
     application_id: int,
     participant_id: int,
     background_tasks: BackgroundTasks,
@@ -3,7 +3,7 @@ import io
 import json
 from typing import List
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
@@ -12,6 +12,8 @@ from ..crud import items as items_crud
 from ..data import schemas
 from ..data.database import get_db
 from ..data.models import Item
+from ..utils.answer_buffer import drain_answer_buffer
+from ..utils.pagination import PageParams, paginate
 
 router = APIRouter()
 
@@ -96,7 +98,8 @@ def get_items_csv(db: Session = Depends(get_db)):
         csv_writer.writerow(headers)
 
         for item in items:
-            row = [getattr(item, header, "") or "" for header in headers]
+            item_data = schemas.ItemResponse.model_validate(item).model_dump()
+            row = [item_data[header] or "" for header in headers]
             csv_writer.writerow(row)
 
         csv_file.seek(0)
@@ -134,8 +137,22 @@ def delete_item(item_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/items/{item_id}/answers/", response_model=List[schemas.Answer])
-def read_answers_by_item(item_id: int, db: Session = Depends(get_db)):
-    return answers_crud.get_answers_by_item(db, item_id)
+def read_answers_by_item(
+    item_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    drain_answer_buffer()
+    return paginate(
+        db,
+        response,
+        page,
+        lambda db, after_id, limit: answers_crud.get_answers_by_item(
+            db, item_id, after_id, limit
+        ),
+        schemas.Answer,
+    )
 
 # TODO: maybe rebuild using minio?
 # @app.post("/items/upload/", response_model=survey_design_schemas.Item)
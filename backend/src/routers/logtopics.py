@@ -1,18 +1,19 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 
 from ..data import schemas
 from ..data.database import get_db
 from ..data.models import LogTopic
+from ..utils.pagination import PageParams, keyset, paginate
 
 router = APIRouter()
 
 
 # LogTopic routes
 @router.post("/logtopics/", response_model=schemas.LogTopic)
-async def create_logtopic(
+def create_logtopic(
     logtopic: schemas.LogTopicCreate, db: Session = Depends(get_db)
 ):
     db_logtopic = LogTopic(**logtopic.model_dump())
@@ -23,8 +24,15 @@ async def create_logtopic(
 
 
 @router.get("/logtopics/", response_model=List[schemas.LogTopic])
-async def read_logtopics(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+def read_logtopics(
+    response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)
 ):
-    logtopics = db.query(LogTopic).offset(skip).limit(limit).all()
-    return logtopics
+    return paginate(
+        db,
+        response,
+        page,
+        lambda db, after_id, limit: keyset(
+            db.query(LogTopic), LogTopic.id, after_id, limit
+        ).all(),
+        schemas.LogTopic,
+    )
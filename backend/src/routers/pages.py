@@ -1,19 +1,20 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..crud import items as items_crud
 from ..crud import pages as pages_crud
 from ..data import schemas
-from ..data.database import get_db
+from ..data.database import get_async_db, get_db
 
 router = APIRouter()
 
 
 @router.get("/pages/{page_id}", response_model=schemas.Page)
-def read_page(page_id: int, db: Session = Depends(get_db)):
-    db_page = pages_crud.get_page(db, page_id)
+async def read_page(page_id: int, db: AsyncSession = Depends(get_async_db)):
+    # read by every participant on every page, without taking a threadpool worker
+    db_page = await pages_crud.get_page_async(db, page_id)
     if db_page is None:
         raise HTTPException(status_code=404, detail="Page not found")
     return db_page
@@ -93,4 +94,5 @@ def read_items(page_id: int, db: Session = Depends(get_db)):
     db_page = pages_crud.get_page(db, page_id)
     if db_page is None:
         raise HTTPException(status_code=404, detail="Page not found")
-    return items_crud.get_items_by_page(db, page_id)
+    # loaded in order with the page
+    return db_page.items
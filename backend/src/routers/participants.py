@@ -1,19 +1,30 @@
+from datetime import datetime, timezone
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..crud import answers as answers_crud
+from ..crud import pages as pages_crud
 from ..crud import participants as participants_crud
 from ..crud import publications as publications_crud
 from ..data import schemas
-from ..data.database import get_db
+from ..data.database import get_async_db, get_db
+from ..utils.answer_buffer import (
+    ANSWER_WRITE_BEHIND,
+    answer_buffer,
+    drain_answer_buffer,
+)
+from ..utils.event_writer import page_event_writer
+from ..utils.pagination import PageParams, paginate
 
 router = APIRouter()
 
 
 @router.post("/participants/", response_model=schemas.Participant)
-async def create_participant(
+def create_participant(
     participant: schemas.ParticipantCreate, db: Session = Depends(get_db)
 ):
     try:
@@ -24,12 +35,106 @@ async def create_participant(
 
 
 @router.get("/participants/{participant_id}", response_model=schemas.Participant)
-def read_participant(participant_id: int, db: Session = Depends(get_db)):
-    return publications_crud.get_participant(db, participant_id)
+async def read_participant(
+    participant_id: int, db: AsyncSession = Depends(get_async_db)
+):
+    db_participant = await publications_crud.get_participant_async(db, participant_id)
+    if db_participant is None:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    return db_participant
 
 
 @router.get(
     "/participants/{participant_id}/answers/", response_model=List[schemas.Answer]
 )
-def read_answers_by_participant(participant_id: int, db: Session = Depends(get_db)):
-    return answers_crud.get_answers_by_participant(db, participant_id)
+def read_answers_by_participant(
+    participant_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    drain_answer_buffer()
+    return paginate(
+        db,
+        response,
+        page,
+        lambda db, after_id, limit: answers_crud.get_answers_by_participant(
+            db, participant_id, after_id, limit
+        ),
+        schemas.Answer,
+    )
+
+
+@router.post(
+    "/participants/{participant_id}/page-events",
+    response_model=bool,
+    status_code=202,
+)
+def record_page_events(
+    participant_id: int,
+    events: List[schemas.PageEventCreate],
+    db: Session = Depends(get_db),
+):
+    """
+    Records the participant entering and leaving survey pages. The events are
+    written to the database in batches in the background.
+    """
+    if publications_crud.get_participant(db, participant_id) is None:
+        raise HTTPException(status_code=404, detail="Participant not found")
+
+    received = datetime.now(timezone.utc)
+    page_event_writer.append(
+        [
+            {
+                "participant_id": participant_id,
+                "page_id": event.page_id,
+                "event": event.event.value,
+                "timestamp": event.timestamp or received,
+            }
+            for event in events
+        ]
+    )
+    return True
+
+
+@router.post(
+    "/participants/{participant_id}/pages/{page_id}/answers:batch",
+    response_model=List[schemas.PageAnswerResult],
+)
+def submit_page_answers(
+    participant_id: int,
+    page_id: int,
+    answers: List[schemas.PageAnswer],
+    db: Session = Depends(get_db),
+):
+    """
+    Saves all answers of a page in a single transaction. Answers the
+    participant already gave for an item are updated, so retries are safe.
+    """
+    if publications_crud.get_participant(db, participant_id) is None:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    if pages_crud.get_page(db, page_id) is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    if ANSWER_WRITE_BEHIND:
+        # journaled, but not yet in the database and without ids
+        answer_buffer.append(
+            [
+                {
+                    "participant_id": participant_id,
+                    "item_id": answer.item_id,
+                    "page_id": page_id,
+                    "value": answer.value,
+                }
+                for answer in answers
+            ]
+        )
+        return JSONResponse(
+            status_code=202, content=[{"item_id": answer.item_id} for answer in answers]
+        )
+
+    answer_ids = answers_crud.upsert_page_answers(db, participant_id, page_id, answers)
+    return [
+        schemas.PageAnswerResult(id=answer_id, item_id=item_id)
+        for item_id, answer_id in answer_ids.items()
+    ]
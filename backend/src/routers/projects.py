@@ -2,23 +2,25 @@ import logging
 import os
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from minio import Minio
 import minio
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from src.crud import projects as crud
 
 from ..data import schemas
 from ..data.database import get_db
 from ..data.models import (
     Application,
+    Page,
     Project,
     Publication,
     Repo,
     Survey,
 )
 from ..utils.kubernetes import get_application_status
+from ..utils.pagination import PageParams, keyset, paginate
 
 router = APIRouter()
 
@@ -30,7 +32,7 @@ MINIO_PASSWORD = os.getenv("MINIO_PASSWORD")
 
 # Project routes
 @router.post("/projects/", response_model=schemas.Project)
-async def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
+def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
     db_project = Project(**project.model_dump())
     db.add(db_project)
     db.flush()
@@ -43,13 +45,22 @@ async def create_project(project: schemas.ProjectCreate, db: Session = Depends(g
 
 
 @router.get("/projects/", response_model=List[schemas.Project])
-async def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    projects = db.query(Project).offset(skip).limit(limit).all()
-    return projects
+def read_projects(
+    response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)
+):
+    return paginate(
+        db,
+        response,
+        page,
+        lambda db, after_id, limit: keyset(
+            db.query(Project), Project.id, after_id, limit
+        ).all(),
+        schemas.Project,
+    )
 
 
 @router.get("/projects/{project_id}", response_model=schemas.Project)
-async def read_project(project_id: int, db: Session = Depends(get_db)):
+def read_project(project_id: int, db: Session = Depends(get_db)):
     project = db.query(Project).filter(Project.id == project_id).first()
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -58,7 +69,7 @@ async def read_project(project_id: int, db: Session = Depends(get_db)):
 
 # Application routes
 @router.post("/projects/{project_id}/application", response_model=schemas.Application)
-async def create_application(
+def create_application(
     project_id: int,
     application: schemas.ApplicationCreate,
     db: Session = Depends(get_db),
@@ -85,7 +96,7 @@ async def create_application(
 @router.get(
     "/projects/{project_id}/publications", response_model=List[schemas.Publication]
 )
-async def read_project_publications(project_id: int, db: Session = Depends(get_db)):
+def read_project_publications(project_id: int, db: Session = Depends(get_db)):
     publications = (
         db.query(Publication).filter(Publication.project_id == project_id).all()
     )
@@ -93,7 +104,7 @@ async def read_project_publications(project_id: int, db: Session = Depends(get_d
 
 
 @router.patch("/projects/{project_id}/application", response_model=schemas.Application)
-async def patch_project_application(
+def patch_project_application(
     project_id: int,
     application: schemas.ApplicationUpdate,
     db: Session = Depends(get_db),
@@ -118,9 +129,12 @@ async def patch_project_application(
 @router.get(
     "/projects/{project_id}/application", response_model=schemas.ApplicationWithStatus
 )
-async def read_project_application(project_id: int, db: Session = Depends(get_db)):
+def read_project_application(project_id: int, db: Session = Depends(get_db)):
     application = (
-        db.query(Application).filter(Application.project_id == project_id).first()
+        db.query(Application)
+        .options(joinedload(Application.project))
+        .filter(Application.project_id == project_id)
+        .first()
     )
 
     if application is None:
@@ -141,7 +155,7 @@ async def read_project_application(project_id: int, db: Session = Depends(get_db
 
 
 @router.put("/projects/{project_id}/application", response_model=schemas.Application)
-async def update_project_application(
+def update_project_application(
     project_id: int,
     application: schemas.ApplicationUpdate,
     db: Session = Depends(get_db),
@@ -165,7 +179,7 @@ async def update_project_application(
     "/projects/{project_id}/application/containers",
     response_model=List[schemas.Container],
 )
-async def read_application_containers(
+def read_application_containers(
     project_id: int,
     skip: int = 0,
     limit: int = 100,
@@ -178,7 +192,7 @@ async def read_application_containers(
     "/projects/{project_id}/application/containers/{container_id}",
     response_model=schemas.Container,
 )
-async def read_container(
+def read_container(
     project_id: int, container_id: int, db: Session = Depends(get_db)
 ):
     db_container = crud.get_container(db, container_id)
@@ -190,7 +204,7 @@ async def read_container(
 @router.delete(
     "/projects/{project_id}/application/containers/{container_id}", status_code=204
 )
-async def delete_container(
+def delete_container(
     project_id: int, container_id: int, db: Session = Depends(get_db)
 ):
     result = crud.delete_container(db, container_id)
@@ -201,7 +215,7 @@ async def delete_container(
 
 # Repo routes
 @router.post("/projects/{project_id}/repo", response_model=schemas.Repo)
-async def create_project_repo(
+def create_project_repo(
     project_id: int,
     repo: schemas.RepoCreate,
     db: Session = Depends(get_db),
@@ -242,7 +256,7 @@ async def create_project_repo(
 
 
 @router.get("/projects/{project_id}/repo", response_model=schemas.Repo)
-async def read_project_repo(project_id: int, db: Session = Depends(get_db)):
+def read_project_repo(project_id: int, db: Session = Depends(get_db)):
     db_repo = (
         db.query(Repo)
         .join(Application)
@@ -257,7 +271,7 @@ async def read_project_repo(project_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/projects/{project_id}/repo", response_model=schemas.Repo)
-async def update_project_repo(
+def update_project_repo(
     project_id: int,
     repo: schemas.RepoUpdate,
     db: Session = Depends(get_db),
@@ -285,7 +299,7 @@ async def update_project_repo(
 @router.post(
     "/projects/{project_id}/application/containers/", response_model=schemas.Container
 )
-async def create_container(
+def create_container(
     project_id: int,
     container: schemas.ContainerFormSchema,
     db: Session = Depends(get_db),
@@ -300,7 +314,7 @@ async def create_container(
     "/projects/{project_id}/application/containers/{container_id}",
     response_model=schemas.Container,
 )
-async def update_container(
+def update_container(
     project_id: int,
     container_id: int,
     container: schemas.ContainerFormSchema,
@@ -313,7 +327,7 @@ async def update_container(
 
 
 @router.post("/projects/{project_id}/survey", response_model=schemas.Survey)
-async def create_project_survey(
+def create_project_survey(
     project_id: int,
     survey: schemas.SurveyBase,
     db: Session = Depends(get_db),
@@ -336,15 +350,20 @@ async def create_project_survey(
 
 
 @router.get("/projects/{project_id}/survey", response_model=schemas.Survey)
-async def get_project_survey(project_id: int, db: Session = Depends(get_db)):
-    db_survey = db.query(Survey).filter(Survey.project_id == project_id).first()
+def get_project_survey(project_id: int, db: Session = Depends(get_db)):
+    db_survey = (
+        db.query(Survey)
+        .options(selectinload(Survey.pages).selectinload(Page.items))
+        .filter(Survey.project_id == project_id)
+        .first()
+    )
     if db_survey is None:
         raise HTTPException(status_code=404, detail="Survey not found for this project")
     return db_survey
 
 
 @router.put("/projects/{project_id}/survey", response_model=schemas.Survey)
-async def update_project_survey(
+def update_project_survey(
     project_id: int,
     survey: schemas.SurveyUpdate,
     db: Session = Depends(get_db),
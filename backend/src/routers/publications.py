@@ -1,13 +1,16 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..crud import publications as publications_crud
 from ..data import schemas
-from ..data.database import get_db
+from ..data.database import get_async_db, get_db
 from ..tasks.tasks import deploy_task
+from ..utils.pagination import PageParams, paginate
+from ..utils.survey_bundle import etag_matches, get_survey_bundle
 
 router = APIRouter()
 
@@ -20,14 +23,21 @@ def create_publication(
 
 
 @router.get("/publications/", response_model=List[schemas.Publication])
-def read_publications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    publications = publications_crud.get_publications(db, skip=skip, limit=limit)
-    return publications
+def read_publications(
+    response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)
+):
+    return paginate(
+        db, response, page, publications_crud.get_publications, schemas.Publication
+    )
 
 
 @router.get("/publications/uuid/{link_uuid}", response_model=schemas.Publication)
-def read_publication_by_uuid(link_uuid: str, db: Session = Depends(get_db)):
-    db_publication = publications_crud.get_publication_by_uuid(db, link_uuid=link_uuid)
+async def read_publication_by_uuid(
+    link_uuid: str, db: AsyncSession = Depends(get_async_db)
+):
+    db_publication = await publications_crud.get_publication_by_uuid_async(
+        db, link_uuid=link_uuid
+    )
     if db_publication is None:
         raise HTTPException(status_code=404, detail="Publication not found")
     if not db_publication.is_active():
@@ -35,6 +45,37 @@ def read_publication_by_uuid(link_uuid: str, db: Session = Depends(get_db)):
     return db_publication
 
 
+@router.get("/publications/uuid/{link_uuid}/bundle", response_model=schemas.Survey)
+def read_publication_bundle(
+    link_uuid: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns the published survey with all pages and items in one response,
+    served from memory until the survey is edited.
+    """
+    result = publications_crud.get_publication_survey_version_by_uuid(
+        db, link_uuid=link_uuid
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Publication not found")
+    db_publication, survey_id, survey_version = result
+    if not db_publication.is_active():
+        raise HTTPException(status_code=403, detail="Publication not active")
+    if survey_id is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    bundle = get_survey_bundle(db, survey_id, survey_version)
+    # clients revalidate every time, as the publication may end
+    headers = {"ETag": bundle.etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag_matches(if_none_match, bundle.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=bundle.content, media_type="application/json", headers=headers
+    )
+
+
 @router.get("/publications/{publication_id}", response_model=schemas.Publication)
 def read_publication(publication_id: int, db: Session = Depends(get_db)):
     db_publication = publications_crud.get_publication(
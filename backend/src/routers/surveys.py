@@ -1,8 +1,7 @@
-import io
 import logging
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
@@ -13,8 +12,17 @@ from ..crud import items as items_crud
 from ..crud import pages as pages_crud
 from ..crud import surveys as surveys_crud
 from ..data import schemas
-from ..data.models import Answer, Item, Page, Survey
-from ..utils.export import generate_csv
+from ..utils.export import (
+    build_answer_matrix,
+    stream_answer_matrix_csv,
+    stream_survey_csv,
+    stream_survey_json,
+    write_answer_matrix_columnar,
+)
+from ..utils.answer_buffer import drain_answer_buffer
+from ..utils.pagination import PageParams, paginate
+from ..utils.survey_bundle import evict_survey_bundle
+from ..utils.survey_stats import compute_survey_progress, compute_survey_stats
 
 router = APIRouter()
 
@@ -47,6 +55,7 @@ def delete_survey(survey_id: int, db: Session = Depends(get_db)):
     success = surveys_crud.delete_survey(db, survey_id)
     if not success:
         raise HTTPException(status_code=404, detail="Survey not found")
+    evict_survey_bundle(survey_id)
     return success
 
 
@@ -98,97 +107,124 @@ def read_pages(survey_id: int, db: Session = Depends(get_db)):
     db_survey = surveys_crud.get_survey(db, survey_id)
     if db_survey is None:
         raise HTTPException(status_code=404, detail="Survey not found")
-    return pages_crud.get_pages_by_survey(db, survey_id)
+    # loaded in order, with their items, with the survey
+    return db_survey.pages
 
 
 @router.get("/surveys/{survey_id}/answers/", response_model=List[schemas.Answer])
-def read_answers_by_survey(survey_id: int, db: Session = Depends(get_db)):
-    return answers_crud.get_answers_by_survey(db, survey_id)
+def read_answers_by_survey(
+    survey_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    drain_answer_buffer()
+    return paginate(
+        db,
+        response,
+        page,
+        lambda db, after_id, limit: answers_crud.get_answers_by_survey(
+            db, survey_id, after_id, limit
+        ),
+        schemas.Answer,
+    )
+
+
+@router.get("/surveys/{survey_id}/stats", response_model=schemas.SurveyStats)
+def read_survey_stats(survey_id: int, db: Session = Depends(get_db)):
+    """
+    Returns the answer counts, value distributions and means per item and the
+    completion funnel over the pages of a survey.
+    """
+    db_survey = surveys_crud.get_survey(db, survey_id)
+    if db_survey is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return compute_survey_stats(db, survey_id)
 
 
-from sqlalchemy.orm import joinedload
+@router.get("/surveys/{survey_id}/progress", response_model=schemas.SurveyProgress)
+def read_survey_progress(survey_id: int, db: Session = Depends(get_db)):
+    """
+    Returns the visitors, dwell time and dropout per page of a survey, from
+    the page events recorded by the participants.
+    """
+    db_survey = surveys_crud.get_survey(db, survey_id)
+    if db_survey is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return compute_survey_progress(db, survey_id)
 
 
 @router.get("/surveys/{survey_id}/export")
 def export_survey(
     survey_id: int,
-    format: str = Query(..., regex="^(csv|json)$"),
+    format: str = Query(..., pattern="^(csv|json)$"),
     db: Session = Depends(get_db),
 ):
     try:
-        # Fetch survey with pages, items, and answers in a single query
-        survey = (
-            db.query(Survey)
-            .options(
-                joinedload(Survey.pages).joinedload(Page.items).joinedload(Item.answers)
-            )
-            .filter(Survey.id == survey_id)
-            .first()
-        )
-
+        survey = surveys_crud.get_survey(db, survey_id)
         if survey is None:
             raise HTTPException(status_code=404, detail="Survey not found")
 
-        # Convert to dict manually to control the depth and content
-        survey_dict = {
+        survey_info = {
             "id": survey.id,
             "title": survey.title,
             "description": survey.description,
-            "pages": [],
         }
 
-        for page in survey.pages:
-            page_dict = {
-                "id": page.id,
-                "name": page.name,
-                "description": page.description,
-                "order": page.order,
-                "items": [],
-            }
-
-            for item in page.items:
-                item_dict = {
-                    "id": item.id,
-                    "title": getattr(item, "title", None),
-                    "prompt": getattr(item, "prompt", None),
-                    "item_type": getattr(item, "item_type", None),
-                    "question_type": getattr(item, "question_type", None),
-                    "options": getattr(item, "options", None),
-                    "answers": [
-                        {
-                            "id": answer.id,
-                            "value": answer.value,
-                            "participant_id": answer.participant_id,
-                            "created_at": (
-                                answer.created_at.isoformat()
-                                if answer.created_at
-                                else None
-                            ),
-                            "updated_at": (
-                                answer.updated_at.isoformat()
-                                if answer.updated_at
-                                else None
-                            ),
-                        }
-                        for answer in item.answers
-                    ],
-                }
-                page_dict["items"].append(item_dict)
-
-            survey_dict["pages"].append(page_dict)
-
         logging.info(f"Exporting survey {survey_id} with answers")
 
+        # The generators open their own session, as the request session is
+        # closed before the response body is streamed.
         if format == "json":
-            return JSONResponse(content=survey_dict)
+            return StreamingResponse(
+                stream_survey_json(survey_info), media_type="application/json"
+            )
         elif format == "csv":
-            csv_content = generate_csv(survey_dict)
             filename = f"survey_{survey_id}_with_answers.csv"
             return StreamingResponse(
-                io.StringIO(csv_content),
+                stream_survey_csv(survey_info),
                 media_type="text/csv",
                 headers={"Content-Disposition": f"attachment; filename={filename}"},
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error exporting survey {survey_id}: {str(e)}")
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/surveys/{survey_id}/export/matrix")
+def export_survey_matrix(
+    survey_id: int,
+    format: str = Query(..., pattern="^(csv|columnar)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Exports the latest answers as a participant x item matrix. The columnar
+    format is Parquet if pyarrow is installed, else a NumPy .npz archive.
+    """
+    db_survey = surveys_crud.get_survey(db, survey_id)
+    if db_survey is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    try:
+        matrix = build_answer_matrix(db, survey_id)
+    except Exception as e:
+        logging.error(f"Error exporting answer matrix of survey {survey_id}: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    if format == "csv":
+        filename = f"survey_{survey_id}_answer_matrix.csv"
+        return StreamingResponse(
+            stream_answer_matrix_csv(matrix),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+    content, extension, media_type = write_answer_matrix_columnar(matrix)
+    filename = f"survey_{survey_id}_answer_matrix.{extension}"
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
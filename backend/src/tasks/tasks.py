@@ -9,7 +9,9 @@ logging.basicConfig(level=logging.INFO)
 
 
 async def deploy_task(survey_name: str, user_id: str):
-    deployment_successful = await create_user_participation_object(survey_name, user_id)
+    deployment_successful = await create_user_participation_object(
+        survey_name, user_id
+    )
 
     if not deployment_successful:
         logging.error(
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from ..crud import answers as answers_crud
+from ..data.database import SessionLocalSurveyDesign
+
+# Acknowledge answers once journaled and write them to the database in
+# batches, instead of one transaction per answer
+ANSWER_WRITE_BEHIND = os.getenv("ANSWER_WRITE_BEHIND", "").lower() in ("1", "true")
+ANSWER_FLUSH_INTERVAL_MS = int(os.getenv("ANSWER_FLUSH_INTERVAL_MS") or 200)
+if os.getenv("KUBERNETES_PORT"):
+    ANSWER_JOURNAL_DIR = Path(os.getenv("ANSWER_JOURNAL_DIR") or "/db/answer-journal")
+else:
+    ANSWER_JOURNAL_DIR = Path(os.getenv("ANSWER_JOURNAL_DIR") or "./answer-journal")
+
+JOURNAL_SEGMENT_PREFIX = "answers."
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for answers. Each answer is appended to a journal file
+    and fsynced before it is acknowledged, and written to the database with
+    the other queued answers in one transaction every flush interval.
+
+    The journal is split into numbered segments. A flush starts a new segment
+    and deletes the previous ones once their answers are committed, so the
+    segments left after a crash hold every answer that may not have reached
+    the database. They are replayed on start; as answers are upserted per
+    participant and item, replaying an answer that was written is harmless.
+
+    Only one process may use a journal directory.
+    """
+
+    def __init__(self, journal_dir: Path, flush_interval_ms: int):
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: List[Dict[str, Any]] = []
+        # guards the queue, the current segment and its counters
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # serializes fsyncs and switching to the next segment
+        self._sync_lock = threading.Lock()
+        self._segment = 0
+        self._journal = None
+        self._appended = 0
+        self._synced = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.journal_dir / f"{JOURNAL_SEGMENT_PREFIX}{segment:010d}"
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(path.name[len(JOURNAL_SEGMENT_PREFIX) :])
+            for path in self.journal_dir.glob(f"{JOURNAL_SEGMENT_PREFIX}*")
+        )
+
+    def _open_segment(self, segment: int):
+        self._segment = segment
+        self._journal = open(self._segment_path(segment), "a", encoding="utf-8")
+
+    def _delete_segments(self, up_to: int):
+        for segment in self._segments():
+            if segment <= up_to:
+                self._segment_path(segment).unlink()
+
+    def _write(self, answers: List[Dict[str, Any]]):
+        with SessionLocalSurveyDesign() as db:
+            answers_crud.upsert_answers(db, answers)
+
+    def _replay(self):
+        answers = []
+        for segment in self._segments():
+            with open(self._segment_path(segment), encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        answers.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # the last line of a segment may be torn by a crash
+                        logging.warning(f"Skipping torn journal entry {line!r}")
+        if answers:
+            logging.info(f"Replaying {len(answers)} journaled answers")
+            self._write(answers)
+        return self._segments()
+
+    def start(self):
+        """Replays the journal left by the previous run and starts flushing."""
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        segments = self._replay()
+        if segments:
+            self._delete_segments(segments[-1])
+        self._open_segment(segments[-1] + 1 if segments else 0)
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="answer-writer", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, answers: List[Dict[str, Any]]):
+        """Returns once the answers are durably journaled."""
+        data = "".join(json.dumps(answer) + "\n" for answer in answers)
+        with self._lock:
+            self._journal.write(data)
+            self._journal.flush()
+            self._queue.extend(answers)
+            self._appended += 1
+            position = self._appended
+
+        # group commit, one fsync covers everything appended before it. The
+        # segment isn't switched meanwhile, as flush holds the sync lock.
+        with self._sync_lock:
+            if self._synced < position:
+                with self._lock:
+                    target = self._appended
+                os.fsync(self._journal.fileno())
+                self._synced = target
+
+    def flush(self):
+        """Writes the queued answers to the database in one transaction."""
+        with self._flush_lock:
+            with self._sync_lock, self._lock:
+                answers, self._queue = self._queue, []
+                if not answers:
+                    return
+                # answers appended from now on go to the next segment
+                flushed_segment = self._segment
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._open_segment(flushed_segment + 1)
+                self._synced = self._appended
+
+            try:
+                try:
+                    self._write(answers)
+                except IntegrityError:
+                    # an answer to a deleted item fails the whole batch
+                    for answer in answers:
+                        try:
+                            self._write([answer])
+                        except IntegrityError as e:
+                            logging.error(f"Dropping answer {answer}: {str(e)}")
+            except Exception as e:
+                logging.error(f"Failed to write {len(answers)} answers: {str(e)}")
+                # retried with the next flush, the segments are kept until then
+                with self._lock:
+                    self._queue = answers + self._queue
+                return
+            self._delete_segments(flushed_segment)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stops flushing periodically and writes the queued answers."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        self._journal.close()
+
+
+answer_buffer = AnswerBuffer(ANSWER_JOURNAL_DIR, ANSWER_FLUSH_INTERVAL_MS)
+
+
+def drain_answer_buffer():
+    """
+    Writes the queued answers, so reading or changing answers afterwards sees
+    every acknowledged answer.
+    """
+    if ANSWER_WRITE_BEHIND:
+        answer_buffer.flush()
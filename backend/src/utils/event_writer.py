@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List
+
+from sqlalchemy import Engine, Table, insert
+
+from ..data.database import engine_db
+from ..data.models import PageEvent
+
+# Rows are inserted once this many are buffered, or after the interval
+EVENT_FLUSH_SIZE = int(os.getenv("EVENT_FLUSH_SIZE") or 500)
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL") or 2)
+# Rows kept while the database is unavailable, the oldest are dropped first
+MAX_BUFFERED_EVENTS = int(os.getenv("MAX_BUFFERED_EVENTS") or 100000)
+
+
+class BufferedEventWriter:
+    """
+    Collects rows for an append-only table in memory and inserts them in
+    batches from a background thread, so recording an event costs a request
+    no database round trip. Rows still buffered when the process is killed
+    are lost, which is acceptable for analytics events.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        engine: Engine,
+        flush_size: int = EVENT_FLUSH_SIZE,
+        flush_interval: float = EVENT_FLUSH_INTERVAL,
+    ):
+        self.table = table
+        self.engine = engine
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def append(self, rows: List[Dict[str, Any]]):
+        with self._lock:
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.flush_size
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.table.name}-writer", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(insert(self.table), rows)
+            except Exception as e:
+                logging.error(
+                    f"Failed to write {len(rows)} {self.table.name} rows: {str(e)}"
+                )
+                with self._lock:
+                    self._rows = (rows + self._rows)[-MAX_BUFFERED_EVENTS:]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        """Stops the background thread and writes the remaining rows."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+page_event_writer = BufferedEventWriter(PageEvent.__table__, engine_db)
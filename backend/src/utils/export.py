@@ -1,211 +1,414 @@
 import csv
 import io
 import json
-from typing import Any, Dict, Optional
-
-from fastapi import HTTPException
-from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import RelationshipProperty, Session
-
-from ..crud import surveys as surveys_crud
-from ..crud import items as items_crud
-from ..data.models import Survey
-
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Result, Text, cast, func, select
+from sqlalchemy.orm import Session
+
+from ..data.database import SessionLocalSurveyDesign
+from ..data.enums import ItemType, QuestionType
+from ..data.models import (
+    Answer,
+    Item,
+    ItemTemplate,
+    Page,
+    page_item_association,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, the answer matrix falls back to .npz
+    pa = None
+    pq = None
+
+# Rows fetched per round trip while streaming exports
+EXPORT_BATCH_SIZE = 1000
+
+# Question types whose answers are numbers (matrix scale: one per statement)
+NUMERIC_QUESTION_TYPES = (
+    QuestionType.SCALE,
+    QuestionType.LIKERT_SCALE,
+    QuestionType.MATRIX_SCALE,
+)
+
+
+def _resolved_item_column(name: str):
+    # Item fields fall back to their template like Item.resolved_<name>, but
+    # from the joined template instead of a subquery per row
+    return func.coalesce(getattr(Item, name), getattr(ItemTemplate, name)).label(
+        f"item_{name}"
+    )
 
-def get_survey_answers(db: Session, survey_id: int) -> Dict[str, Any]:
-    survey = surveys_crud.get_survey(db, survey_id)
-    if survey is None:
-        raise HTTPException(status_code=404, detail="Survey not found")
 
-    survey_dict = model_to_dict(survey)
+def _survey_export_rows(db: Session, survey_id: int) -> Result:
+    """
+    Streams the flattened page/item/answer rows of a survey, ordered so the
+    nested export can be written incrementally without holding it in memory.
+    """
+    stmt = (
+        select(
+            Page.id.label("page_id"),
+            Page.name.label("page_name"),
+            Page.description.label("page_description"),
+            Page.order.label("page_order"),
+            Item.id.label("item_id"),
+            _resolved_item_column("title"),
+            _resolved_item_column("prompt"),
+            _resolved_item_column("item_type"),
+            _resolved_item_column("question_type"),
+            _resolved_item_column("options"),
+            Answer.id.label("answer_id"),
+            Answer.value.label("answer_value"),
+            Answer.participant_id.label("answer_participant_id"),
+            Answer.created_at.label("answer_created_at"),
+            Answer.updated_at.label("answer_updated_at"),
+        )
+        .select_from(Page)
+        .outerjoin(page_item_association, page_item_association.c.page_id == Page.id)
+        .outerjoin(Item, Item.id == page_item_association.c.item_id)
+        .outerjoin(ItemTemplate, ItemTemplate.id == Item.template_id)
+        .outerjoin(Answer, Answer.item_id == Item.id)
+        .where(Page.survey_id == survey_id)
+        .order_by(
+            Page.order, Page.id, page_item_association.c.order, Item.id, Answer.id
+        )
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    return db.execute(stmt)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _json_object_prefix(obj: Dict[str, Any], list_key: str) -> str:
+    # '{"id": 1, ..., "<list_key>": [' -- the caller closes the list and object
+    return f"{json.dumps(obj)[:-1]}, {json.dumps(list_key)}: ["
+
+
+def stream_survey_json(survey_info: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yields the survey export as JSON fragments, one chunk per batch of rows.
+    """
+    yield _json_object_prefix(survey_info, "pages")
+
+    with SessionLocalSurveyDesign() as db:
+        page_id = None
+        item_id = None
+        has_answers = False
+        for partition in _survey_export_rows(db, survey_info["id"]).partitions():
+            chunk = []
+            for row in partition:
+                if row.page_id != page_id:
+                    if item_id is not None:
+                        chunk.append("]}")
+                    if page_id is not None:
+                        chunk.append("]}, ")
+                    page = {
+                        "id": row.page_id,
+                        "name": row.page_name,
+                        "description": row.page_description,
+                        "order": row.page_order,
+                    }
+                    chunk.append(_json_object_prefix(page, "items"))
+                    page_id = row.page_id
+                    item_id = None
+
+                if row.item_id is None:
+                    continue
+
+                if row.item_id != item_id:
+                    if item_id is not None:
+                        chunk.append("]}, ")
+                    item = {
+                        "id": row.item_id,
+                        "title": row.item_title,
+                        "prompt": row.item_prompt,
+                        "item_type": row.item_item_type,
+                        "question_type": row.item_question_type,
+                        "options": row.item_options,
+                    }
+                    chunk.append(_json_object_prefix(item, "answers"))
+                    item_id = row.item_id
+                    has_answers = False
+
+                if row.answer_id is not None:
+                    answer = {
+                        "id": row.answer_id,
+                        "value": row.answer_value,
+                        "participant_id": row.answer_participant_id,
+                        "created_at": _isoformat(row.answer_created_at),
+                        "updated_at": _isoformat(row.answer_updated_at),
+                    }
+                    if has_answers:
+                        chunk.append(", ")
+                    chunk.append(json.dumps(answer))
+                    has_answers = True
+            yield "".join(chunk)
+
+        if item_id is not None:
+            yield "]}"
+        if page_id is not None:
+            yield "]}"
+    yield "]}"
+
+
+class _Echo:
+    """File-like object that hands each csv row straight back to the caller."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def stream_survey_csv(survey_info: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yields the survey export as CSV, one row per answer (or per unanswered
+    item), flushing a chunk per batch of rows.
+    """
+    writer = csv.writer(_Echo())
 
-    if survey_dict is None:
-        raise HTTPException(status_code=404, detail="Survey not found")
+    # Write survey-level data
+    header = [writer.writerow(["Survey Information"])]
+    for key, value in survey_info.items():
+        header.append(writer.writerow([key, value]))
+
+    header.append(writer.writerow([]))  # Empty row for separation
+
+    # Write page, item and answer data
+    header.append(
+        writer.writerow(
+            [
+                "Page ID",
+                "Page Name",
+                "Page Order",
+                "Item ID",
+                "Item Title",
+                "Item Type",
+                "Item Prompt",
+                "Options",
+                "Question Type",
+                "Answer ID",
+                "Participant ID",
+                "Answer Value",
+                "Created At",
+                "Updated At",
+            ]
+        )
+    )
+    yield "".join(header)
+
+    with SessionLocalSurveyDesign() as db:
+        for partition in _survey_export_rows(db, survey_info["id"]).partitions():
+            yield "".join(
+                writer.writerow(
+                    [
+                        row.page_id,
+                        _csv_cell(row.page_name),
+                        row.page_order,
+                        row.item_id,
+                        _csv_cell(row.item_title),
+                        _csv_cell(row.item_item_type),
+                        _csv_cell(row.item_prompt),
+                        _csv_cell(row.item_options),
+                        _csv_cell(row.item_question_type),
+                        _csv_cell(row.answer_id),
+                        _csv_cell(row.answer_participant_id),
+                        _csv_cell(row.answer_value),
+                        _csv_cell(_isoformat(row.answer_created_at)),
+                        _csv_cell(_isoformat(row.answer_updated_at)),
+                    ]
+                )
+                for row in partition
+                if row.item_id is not None
+            )
 
-    # Add answers to each item
-    for page in survey_dict.get("pages", []):
-        for item in page.get("items", []):
-            item_model = items_crud.get_item(db, item["id"])
-            if item_model is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            item["answers"] = [model_to_dict(answer) for answer in item_model.answers]
 
-    return survey_dict
+def _answer_matrix_items(db: Session, survey_id: int) -> List[Any]:
+    """
+    Returns the question items of a survey in page/item order, each listed once.
+    """
+    rows = db.execute(
+        select(
+            Item.id.label("item_id"),
+            _resolved_item_column("item_type"),
+            _resolved_item_column("question_type"),
+            _resolved_item_column("statements"),
+        )
+        .join(page_item_association, page_item_association.c.item_id == Item.id)
+        .join(Page, Page.id == page_item_association.c.page_id)
+        .outerjoin(ItemTemplate, ItemTemplate.id == Item.template_id)
+        .where(Page.survey_id == survey_id)
+        .order_by(Page.order, Page.id, page_item_association.c.order)
+    ).all()
+
+    items = {}
+    for row in rows:
+        if row.item_item_type == ItemType.QUESTION:
+            items.setdefault(row.item_id, row)
+    return list(items.values())
+
+
+def _latest_answers(db: Session, survey_id: int) -> List[Tuple[int, int, str]]:
+    """
+    Returns (participant_id, item_id, raw JSON value) of the latest answer per
+    participant and item on the pages of a survey.
+    """
+    latest_ids = (
+        select(func.max(Answer.id))
+        .join(Page, Page.id == Answer.page_id)
+        .where(Page.survey_id == survey_id)
+        .group_by(Answer.participant_id, Answer.item_id)
+    )
+    # the raw JSON text is decoded per column below, not per row
+    return db.connection().execute(
+        select(
+            Answer.participant_id, Answer.item_id, cast(Answer.value, Text)
+        ).where(Answer.id.in_(latest_ids))
+    ).all()
 
 
-def is_relationship(obj, attr):
-    return isinstance(getattr(type(obj), attr).property, RelationshipProperty)
+def _decode_json_values(values: np.ndarray) -> np.ndarray:
+    # one parse per column rather than one json.loads call per cell
+    decoded = json.loads(f"[{','.join(values)}]")
+    return np.fromiter(decoded, dtype=object, count=len(decoded))
 
 
-def safe_getattr(obj, attr):
+def _decode_numeric_column(raw: np.ndarray) -> np.ndarray:
+    present = np.not_equal(raw, None)
+    column = np.full(raw.shape, np.nan)
     try:
-        return getattr(obj, attr)
-    except AttributeError:
-        return None
-
-
-def model_to_dict(obj, visited=None):
-    if visited is None:
-        visited = set()
-
-    if obj in visited:
-        return None  # Prevent circular references
-
-    visited.add(obj)
-
-    result = {}
-    for c in obj.__table__.columns:
-        value = safe_getattr(obj, c.name)
-        if value is not None:
-            if isinstance(value, (int, float, str, bool)):
-                result[c.name] = value
-            else:
-                # For more complex types (like dates), convert to string
-                result[c.name] = str(value)
-
-    # Include non-circular relationships
-    for attr, _ in inspect(obj.__class__).relationships.items():
-        if not is_relationship(obj, attr):
-            continue
-        value = safe_getattr(obj, attr)
-        if value is None:
-            continue
-        if isinstance(value, list):
-            result[attr] = [
-                model_to_dict(item, visited.copy())
-                for item in value
-                if item is not None
-            ]
-        else:
-            result[attr] = model_to_dict(value, visited.copy())
-
-    visited.remove(obj)
-    return result
+        column[present] = raw[present].astype(float)
+    except ValueError:
+        column[present] = [_as_float(v) for v in _decode_json_values(raw[present])]
+    return column
+
+
+def _decode_text_column(raw: np.ndarray) -> np.ndarray:
+    # JSON strings are unquoted, lists and objects stay JSON encoded
+    present = np.not_equal(raw, None)
+    values = raw[present].astype(str)
+    column = np.full(raw.shape, "", dtype=object)
+    column[present] = np.where(
+        np.char.startswith(values, '"'), _decode_json_values(values), values
+    )
+    return column.astype(str)
 
 
-def survey_to_dict(survey: Survey) -> Optional[Dict[str, Any]]:
-    return model_to_dict(survey)
+def _decode_matrix_column(raw: np.ndarray, statements: int) -> np.ndarray:
+    present = np.flatnonzero(np.not_equal(raw, None))
+    columns = np.full((len(raw), statements), np.nan)
+    for row, values in zip(present, _decode_json_values(raw[present])):
+        if isinstance(values, list):
+            values = [_as_float(v) for v in values[:statements]]
+            columns[row, : len(values)] = values
+    return columns
 
 
-def flatten_dict(d, parent_key="", sep="_"):
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        elif isinstance(v, list):
-            for i, item in enumerate(v):
-                items.extend(flatten_dict(item, f"{new_key}{sep}{i}", sep=sep).items())
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_answer_matrix(db: Session, survey_id: int) -> Dict[str, np.ndarray]:
+    """
+    Pivots the latest answers of a survey into a participant x item matrix.
+
+    Returns an ordered mapping of column name to column, starting with
+    "participant_id". Items become "item_<id>" columns, matrix scale items are
+    expanded into one "item_<id>_<statement index>" column per statement.
+    Numeric question types are float columns with NaN for missing answers,
+    everything else is a string column.
+    """
+    items = _answer_matrix_items(db, survey_id)
+    answers = _latest_answers(db, survey_id)
+
+    if answers:
+        participant_ids, item_ids, values = zip(*answers)
+    else:
+        participant_ids, item_ids, values = (), (), ()
+    participant_ids = np.asarray(participant_ids, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+
+    participants, rows = np.unique(participant_ids, return_inverse=True)
+    matrix = {"participant_id": participants}
+    if not items:
+        return matrix
+
+    # map answer item ids to their grid column, dropping items not on a page
+    grid_item_ids = np.array([item.item_id for item in items], dtype=np.int64)
+    by_id = np.argsort(grid_item_ids)
+    sorted_ids = grid_item_ids[by_id]
+    positions = np.searchsorted(sorted_ids, item_ids).clip(max=len(items) - 1)
+    known = sorted_ids[positions] == item_ids
+
+    grid = np.full((len(participants), len(items)), None, dtype=object)
+    grid[rows[known], by_id[positions[known]]] = np.asarray(values, dtype=object)[
+        known
+    ]
+
+    for index, item in enumerate(items):
+        raw = grid[:, index]
+        name = f"item_{item.item_id}"
+        if item.item_question_type == QuestionType.MATRIX_SCALE:
+            statements = len(item.item_statements or [])
+            expanded = _decode_matrix_column(raw, statements)
+            for statement in range(statements):
+                matrix[f"{name}_{statement}"] = expanded[:, statement]
+        elif item.item_question_type in NUMERIC_QUESTION_TYPES:
+            matrix[name] = _decode_numeric_column(raw)
         else:
-            items.append((new_key, v))
-    return dict(items)
-
-
-def get_project_dict(project):
-    project_dict = {
-        "id": project.id,
-        "title": project.title,
-        "survey": [],
-    }
-
-    if project.survey:
-        survey_dict = get_survey_dict(project.survey)
-        project_dict["survey"].append(survey_dict)
-
-    return project_dict
-
-
-def get_survey_dict(survey):
-    survey_dict = {
-        "id": survey.id,
-        "title": survey.title,
-        "description": survey.description,
-        "pages": [],
-    }
-
-    for page in survey.pages:
-        page_dict = get_page_dict(page)
-        survey_dict["pages"].append(page_dict)
-
-    return survey_dict
-
-
-def get_page_dict(page):
-    page_dict = {
-        "id": page.id,
-        "name": page.name,
-        "description": page.description,
-        "order": page.order,
-        "items": [],
-    }
-
-    for item in page.items:
-        item_dict = get_item_dict(item)
-        page_dict["items"].append(item_dict)
-
-    return page_dict
-
-
-def get_item_dict(item):
-    return {
-        "id": item.id,
-        "title": item.title,
-        "prompt": item.prompt,
-        "item_type": item.item_type,
-        "question_type": item.question_type,
-        "options": item.options,
-        "scale_min": item.scale_min,
-        "scale_max": item.scale_max,
-        "statements": item.statements,
-        "matrix_options": item.matrix_options,
-        "image_url": item.image_url,
-        "video_url": item.video_url,
-        "text_content": item.text_content,
-    }
+            matrix[name] = _decode_text_column(raw)
+    return matrix
+
+
+def stream_answer_matrix_csv(matrix: Dict[str, np.ndarray]) -> Iterator[str]:
+    """
+    Yields the answer matrix as CSV with one row per participant.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(matrix.keys())
+
+    cells = []
+    for column in matrix.values():
+        if column.dtype.kind == "f":
+            formatted = np.char.mod("%g", column).astype(object)
+            formatted[np.isnan(column)] = ""
+            cells.append(formatted)
+        else:
+            cells.append(column)
 
+    rows = zip(*cells)
+    while batch := [row for _, row in zip(range(EXPORT_BATCH_SIZE), rows)]:
+        yield "".join(writer.writerow(row) for row in batch)
 
-def generate_csv(survey_dict: Dict[str, Any]) -> str:
-    output = io.StringIO()
-    writer = csv.writer(output)
 
-    # Write survey-level data
-    writer.writerow(["Survey Information"])
-    survey_info = {k: v for k, v in survey_dict.items() if k != "pages"}
-    for key, value in survey_info.items():
-        writer.writerow([key, value])
-
-    writer.writerow([])  # Empty row for separation
-
-    # Write page and item data
-    writer.writerow(
-        [
-            "Page ID",
-            "Page Name",
-            "Page Order",
-            "Item ID",
-            "Item Title",
-            "Item Type",
-            "Item Prompt",
-            "Options",
-            "Question Type",
-        ]
-    )
+def write_answer_matrix_columnar(
+    matrix: Dict[str, np.ndarray]
+) -> Tuple[bytes, str, str]:
+    """
+    Serializes the answer matrix to Parquet if pyarrow is installed, else to a
+    compressed NumPy .npz archive with one array per column.
 
-    for page in survey_dict.get("pages", []):
-        for item in page.get("items", []):
-            options = json.dumps(item.get("options", [])) if item.get("options") else ""
-            writer.writerow(
-                [
-                    page.get("id", ""),
-                    page.get("name", ""),
-                    page.get("order", ""),
-                    item.get("id", ""),
-                    item.get("title", ""),
-                    item.get("item_type", ""),
-                    item.get("prompt", ""),
-                    options,
-                    item.get("question_type", ""),
-                ]
-            )
+    Returns the content, file extension and media type.
+    """
+    output = io.BytesIO()
+    if pq is not None:
+        pq.write_table(pa.table(matrix), output, compression="zstd")
+        return output.getvalue(), "parquet", "application/vnd.apache.parquet"
 
-    return output.getvalue()
+    np.savez_compressed(output, **matrix)
+    return output.getvalue(), "npz", "application/octet-stream"
@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from kubernetes import client, watch
+
+# Seconds a watch stays open before it is resumed from the last resourceVersion
+WATCH_TIMEOUT = int(os.getenv("K8S_WATCH_TIMEOUT") or 300)
+# Seconds between full lists, which also catch events missed by a broken watch
+RESYNC_INTERVAL = int(os.getenv("K8S_RESYNC_INTERVAL") or 600)
+# Seconds to wait before listing again after the API server failed
+RETRY_DELAY = 5
+
+
+class CustomObjectCache:
+    """
+    In-memory copy of the cluster-scoped custom objects of one kind, kept up to
+    date by a watch in a background thread, like the informers of client-go.
+
+    The objects are listed once and then watched from the resourceVersion of
+    the list. A watch that times out is resumed from the last resourceVersion
+    seen, and the objects are listed again when it has expired (410 Gone) and
+    every RESYNC_INTERVAL. Lookups only read the dict, callers check `synced`
+    and ask the API server themselves while the cache isn't filled.
+    """
+
+    def __init__(
+        self, api: client.CustomObjectsApi, group: str, version: str, plural: str
+    ):
+        self.api = api
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        self._resource_version: Optional[str] = None
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch: Optional[watch.Watch] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def synced(self) -> bool:
+        return self._synced.is_set()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._objects.get(name)
+
+    def _list(self):
+        result = self.api.list_cluster_custom_object(
+            self.group, self.version, self.plural
+        )
+        # replaced at once, so readers never see a partially filled cache
+        self._objects = {obj["metadata"]["name"]: obj for obj in result["items"]}
+        self._resource_version = result["metadata"]["resourceVersion"]
+        self._synced.set()
+
+    def _watch_events(self):
+        self._watch = watch.Watch()
+        stream = self._watch.stream(
+            self.api.list_cluster_custom_object,
+            self.group,
+            self.version,
+            self.plural,
+            resource_version=self._resource_version,
+            allow_watch_bookmarks=True,
+            timeout_seconds=WATCH_TIMEOUT,
+        )
+        for event in stream:
+            obj = event["object"]
+            self._resource_version = obj["metadata"]["resourceVersion"]
+            if event["type"] == "DELETED":
+                self._objects.pop(obj["metadata"]["name"], None)
+            elif event["type"] in ("ADDED", "MODIFIED"):
+                self._objects[obj["metadata"]["name"]] = obj
+            if self._stopped.is_set():
+                self._watch.stop()
+
+    def _run(self):
+        resync_at = 0.0
+        while not self._stopped.is_set():
+            try:
+                if time.monotonic() >= resync_at:
+                    self._list()
+                    resync_at = time.monotonic() + RESYNC_INTERVAL
+                self._watch_events()
+            except Exception as e:
+                resync_at = 0.0
+                # 410 Gone, the resourceVersion is too old to resume from
+                if not (isinstance(e, client.ApiException) and e.status == 410):
+                    self._fail(e)
+
+    def _fail(self, e: Exception):
+        logging.error(f"Watch of {self.plural} failed: {str(e)}")
+        # lookups go to the API server until the objects are listed again
+        self._synced.clear()
+        self._stopped.wait(RETRY_DELAY)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.plural}-watch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops the watch, the thread ends with the next event or timeout."""
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+        self._thread = None
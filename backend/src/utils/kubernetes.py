@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import os
-from typing import Any, Protocol
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Protocol, TypeVar
 from datetime import datetime
 
 import yaml
@@ -15,6 +17,8 @@ from kubernetes.client.models import (
     V1Service,
 )
 
+from .k8s_cache import CustomObjectCache
+
 logging.basicConfig(level=logging.INFO)
 
 if os.getenv("KUBERNETES_PORT"):
@@ -22,11 +26,69 @@ if os.getenv("KUBERNETES_PORT"):
 else:
     config.load_kube_config()
 
+# Requests to the Kubernetes API running at once, each on its own pooled connection
+K8S_MAX_CONCURRENCY = int(os.getenv("K8S_MAX_CONCURRENCY") or 16)
+
+configuration = client.Configuration.get_default_copy()
+configuration.connection_pool_maxsize = K8S_MAX_CONCURRENCY
+api_client = client.ApiClient(configuration)
+custom_api = client.CustomObjectsApi(api_client)
+core_api = client.CoreV1Api(api_client)
+
+_executor = ThreadPoolExecutor(
+    max_workers=K8S_MAX_CONCURRENCY, thread_name_prefix="kubernetes"
+)
+
+# Serve lookups of surveys and participations from watched in-memory copies
+K8S_WATCH_CACHE = os.getenv(
+    "K8S_WATCH_CACHE", "true" if os.getenv("KUBERNETES_PORT") else "false"
+).lower() in ("1", "true")
+
+survey_cache = CustomObjectCache(custom_api, "example.com", "v1", "surveys")
+participation_cache = CustomObjectCache(
+    custom_api, "example.com", "v1", "participations"
+)
+
+T = TypeVar("T")
+
+
+def call_k8s(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs a call of the shared Kubernetes client in its thread pool and waits for
+    it, so no more than K8S_MAX_CONCURRENCY requests are sent at once.
+    """
+    return _executor.submit(fn, *args, **kwargs).result()
+
+
+async def call_k8s_async(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Like call_k8s, without blocking the event loop while waiting."""
+    return await asyncio.wrap_future(_executor.submit(fn, *args, **kwargs))
+
+
+def start_k8s_caches():
+    if K8S_WATCH_CACHE:
+        survey_cache.start()
+        participation_cache.start()
+
+
+def close_k8s_client():
+    """Waits for the running requests and closes the pooled connections."""
+    survey_cache.stop()
+    participation_cache.stop()
+    _executor.shutdown()
+    api_client.close()
+
 
 def get_application_status(application_name: str, namespace: str):
-    api_instance = client.CustomObjectsApi()
+    if survey_cache.synced:
+        application = survey_cache.get(application_name)
+        if application is None:
+            return "Application not created yet"
+        return application.get("status", {}).get("state", "Unknown")
+
     try:
-        application = api_instance.get_namespaced_custom_object(
+        application = call_k8s(
+            custom_api.get_namespaced_custom_object,
             group="example.com",
             version="v1",
             namespace=namespace,
@@ -117,11 +179,13 @@ async def cleanup_participation(user_id: str, survey_name: str):
     if user_id is None or survey_name is None or user_id == "" or survey_name == "":
         return False  # TODO: handle error case
 
-    api = client.CustomObjectsApi()
-
     try:
-        participation_obj = api.get_cluster_custom_object(
-            "example.com", "v1", "participations", f"{user_id}-{survey_name}"
+        participation_obj = await call_k8s_async(
+            custom_api.get_cluster_custom_object,
+            "example.com",
+            "v1",
+            "participations",
+            f"{user_id}-{survey_name}",
         )
     except OpenApiException as e:
         logging.error(e)
@@ -134,8 +198,12 @@ async def cleanup_participation(user_id: str, survey_name: str):
         return False
 
     try:
-        api.delete_cluster_custom_object(
-            "example.com", "v1", "participations", f"{user_id}-{survey_name}"
+        await call_k8s_async(
+            custom_api.delete_cluster_custom_object,
+            "example.com",
+            "v1",
+            "participations",
+            f"{user_id}-{survey_name}",
         )
     except OpenApiException as e:
         logging.error(f"error deleting participation customobject: {e}")
@@ -145,8 +213,6 @@ async def cleanup_participation(user_id: str, survey_name: str):
 
 
 async def create_user_participation_object(survey_name: str, user_id: str):
-    api = client.CustomObjectsApi()
-
     participation_yaml = PARTICIPATION_TEMPLATE.render(
         surveyName=survey_name, userID=user_id
     )
@@ -154,23 +220,31 @@ async def create_user_participation_object(survey_name: str, user_id: str):
     participation_obj = yaml.safe_load(participation_yaml)
     participation_obj["spec"]["userId"] = str(participation_obj["spec"]["userId"])
     logging.info(participation_obj)
-    try:
-        api.get_cluster_custom_object(
-            group="example.com",
-            version="v1",
-            plural="participations",
-            name=f"{user_id}-{survey_name.lower()}",
-        )
+    name = f"{user_id}-{survey_name.lower()}"
+    if participation_cache.synced:
+        exists = participation_cache.get(name) is not None
+    else:
+        try:
+            await call_k8s_async(
+                custom_api.get_cluster_custom_object,
+                group="example.com",
+                version="v1",
+                plural="participations",
+                name=name,
+            )
+            exists = True
+        except client.ApiException as e:
+            if e.status != 404:
+                logging.error(f"Error fetching survey: {e}")
+                return False
+            exists = False
+    if exists:
         logging.info(f"Survey {survey_name} for user {user_id} already exists")
         return True
-    except client.ApiException as e:
-        if e.status != 404:
-            logging.error(f"Error fetching survey: {e}")
-            return False
 
     try:
-
-        api.create_cluster_custom_object(
+        await call_k8s_async(
+            custom_api.create_cluster_custom_object,
             group="example.com",
             version="v1",
             plural="participations",
@@ -181,5 +255,10 @@ async def create_user_participation_object(survey_name: str, user_id: str):
             f"Invalid parameters for call to create_cluster_custom_object: {e}"
         )
         return False
+    except client.ApiException as e:
+        if e.status != 409:
+            raise
+        # created since the cache was updated
+        logging.info(f"Survey {survey_name} for user {user_id} already exists")
 
     return True
@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+import os
+from typing import Any, Callable, Iterator, List, Optional, Type
+
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query as OrmQuery
+from sqlalchemy.orm import Session
+
+from ..data.database import SessionLocalSurveyDesign
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE") or 1000)
+# rows fetched per query while streaming NDJSON
+NDJSON_BATCH_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# fetches up to limit rows with a primary key greater than after_id, in order
+PageFetcher = Callable[[Session, Optional[int], int], List[Any]]
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: OrmQuery, key, after_id: Optional[int], limit: Optional[int]):
+    """
+    Restricts the query to the rows after the cursor, ordered by key. Unlike
+    OFFSET, the database seeks to the cursor instead of skipping rows, so
+    deep pages are as fast as the first one.
+    """
+    if after_id is not None:
+        query = query.filter(key > after_id)
+    query = query.order_by(key)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+class PageParams:
+    """
+    Query parameters of a paginated list endpoint. The JSON response holds one
+    page and the cursor of the next one in the X-Next-Cursor header, NDJSON
+    streams all rows after the cursor.
+    """
+
+    def __init__(
+        self,
+        after: Optional[str] = Query(
+            None, description="Cursor from the X-Next-Cursor header"
+        ),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        format: str = Query("json", pattern="^(json|ndjson)$"),
+    ):
+        self.after_id = decode_cursor(after) if after else None
+        self.limit = limit
+        self.format = format
+
+
+def _stream_ndjson(
+    fetch: PageFetcher, schema: Type[BaseModel], after_id: Optional[int]
+) -> Iterator[str]:
+    # own session, as the request session is closed before the body is streamed
+    with SessionLocalSurveyDesign() as db:
+        while True:
+            rows = fetch(db, after_id, NDJSON_BATCH_SIZE)
+            yield "".join(
+                schema.model_validate(row).model_dump_json() + "\n" for row in rows
+            )
+            if len(rows) < NDJSON_BATCH_SIZE:
+                break
+            after_id = rows[-1].id
+            db.expunge_all()
+
+
+def paginate(
+    db: Session,
+    response: Response,
+    params: PageParams,
+    fetch: PageFetcher,
+    schema: Type[BaseModel],
+):
+    """
+    Returns a page of the rows, or a streaming NDJSON response of all of them.
+    """
+    if params.format == "ndjson":
+        return StreamingResponse(
+            _stream_ndjson(fetch, schema, params.after_id),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    # one extra row tells whether there is a next page
+    rows = fetch(db, params.after_id, params.limit + 1)
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
@@ -0,0 +1,110 @@
+import logging
+import re
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import Engine, event, inspect
+from sqlalchemy.orm import Session
+
+from ..crud import answer_aggregates as answer_aggregates_crud
+from ..crud import answers as answers_crud
+from ..crud import authentication as authentication_crud
+from ..crud import items as items_crud
+from ..crud import pages as pages_crud
+from ..crud import projects as projects_crud
+from ..crud import publications as publications_crud
+from ..crud import responses as responses_crud
+from ..crud import surveys as surveys_crud
+from ..data.models import Base
+
+# CRUD read functions whose queries must be served by an index, with
+# placeholder arguments; only the query plan matters, not the result
+CHECKED_QUERIES: List[Tuple[Callable[..., Any], Dict[str, Any]]] = [
+    (answer_aggregates_crud.get_survey_aggregates, {"survey_id": 0}),
+    (answers_crud.get_answer, {"answer_id": 0}),
+    (answers_crud.get_answers_by_participant, {"participant_id": 0}),
+    (answers_crud.get_answers_by_item, {"item_id": 0}),
+    (answers_crud.get_answers_by_survey, {"survey_id": 0}),
+    (
+        answers_crud.get_latest_answer_by_participant_and_item,
+        {"participant_id": 0, "item_id": 0},
+    ),
+    (authentication_crud.get_user, {"username": ""}),
+    (items_crud.get_item, {"item_id": 0}),
+    (items_crud.get_items_by_page, {"page_id": 0}),
+    (pages_crud.get_page, {"page_id": 0}),
+    (pages_crud.get_pages_by_survey, {"survey_id": 0}),
+    (projects_crud.get_project, {"project_id": 0}),
+    (projects_crud.get_container, {"container_id": 0}),
+    (projects_crud.get_containers_by_project, {"project_id": 0}),
+    (publications_crud.get_participant, {"participant_id": 0}),
+    (publications_crud.get_publication, {"publication_id": 0}),
+    (publications_crud.get_publication_by_uuid, {"link_uuid": str(UUID(int=0))}),
+    (
+        publications_crud.get_publication_survey_version_by_uuid,
+        {"link_uuid": str(UUID(int=0))},
+    ),
+    (responses_crud.get_participant_surveys, {"participant_id": 0}),
+    (surveys_crud.get_survey, {"survey_id": 0}),
+]
+
+# "SCAN answers" / "SCAN TABLE answers AS a", but not scans using an index
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _capture_statements(
+    db: Session, crud_fn: Callable[..., Any], kwargs: Dict[str, Any]
+) -> List[Tuple[str, Any]]:
+    statements = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        statements.append((statement, parameters))
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        crud_fn(db, **kwargs)
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def _full_table_scans(db: Session, statement: str, parameters: Any) -> List[str]:
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    # scans of subqueries (anon_1, ...) are not table scans
+    return [
+        match.group(1)
+        for match in (FULL_SCAN_PATTERN.match(row[-1]) for row in plan)
+        if match and match.group(1) in Base.metadata.tables
+    ]
+
+
+def check_query_plans(engine: Engine):
+    """
+    Runs EXPLAIN QUERY PLAN for the queries of the CRUD read functions and
+    warns about full table scans, so a missing index shows up in the logs at
+    startup instead of as slow requests in production.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    if "alembic_version" not in inspect(engine).get_table_names():
+        logging.warning(
+            "Skipping query plan check, database is not migrated "
+            "(run python -m src.jobs.migrate)"
+        )
+        return
+
+    with Session(bind=engine) as db:
+        for crud_fn, kwargs in CHECKED_QUERIES:
+            for statement, parameters in _capture_statements(db, crud_fn, kwargs):
+                for table in _full_table_scans(db, statement, parameters):
+                    logging.warning(
+                        f"{crud_fn.__module__}.{crud_fn.__name__} does a full "
+                        f"scan of table {table}: {statement}"
+                    )
+        db.rollback()
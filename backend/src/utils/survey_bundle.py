@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from ..data import schemas
+from ..data.models import Page, Survey
+
+
+class SurveyBundle(NamedTuple):
+    version: int
+    etag: str
+    content: bytes
+
+
+# Surveys whose bundles are kept in memory, the least recently used is dropped
+SURVEY_BUNDLE_CACHE_SIZE = int(os.getenv("SURVEY_BUNDLE_CACHE_SIZE") or 64)
+
+# latest bundle per survey id, shared by all requests of this process
+_bundles: "OrderedDict[int, SurveyBundle]" = OrderedDict()
+_build_lock = threading.Lock()
+
+
+def _build_survey_bundle(db: Session, survey_id: int, version: int) -> SurveyBundle:
+    survey = db.scalars(
+        select(Survey)
+        .where(Survey.id == survey_id)
+        .options(selectinload(Survey.pages).selectinload(Page.items))
+    ).one()
+    content = schemas.Survey.model_validate(survey).model_dump_json().encode()
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    return SurveyBundle(version, etag, content)
+
+
+def get_survey_bundle(db: Session, survey_id: int, version: int) -> SurveyBundle:
+    """
+    Returns the survey with its pages and their ordered items, templates
+    resolved, as serialized JSON. The bundle is built once per survey version
+    and then served from memory.
+    """
+    # a bundle built for a later version is at least as recent as requested
+    bundle = _bundles.get(survey_id)
+    if bundle is not None and bundle.version >= version:
+        try:
+            _bundles.move_to_end(survey_id)
+        except KeyError:
+            # evicted by another request meanwhile
+            pass
+        return bundle
+
+    # concurrent requests for a new version wait for a single build
+    with _build_lock:
+        bundle = _bundles.get(survey_id)
+        if bundle is None or bundle.version < version:
+            bundle = _build_survey_bundle(db, survey_id, version)
+            _bundles[survey_id] = bundle
+            _bundles.move_to_end(survey_id)
+            while len(_bundles) > SURVEY_BUNDLE_CACHE_SIZE:
+                _bundles.popitem(last=False)
+    return bundle
+
+
+def evict_survey_bundle(survey_id: int):
+    """Drops the bundle of a deleted survey from this process's cache."""
+    with _build_lock:
+        _bundles.pop(survey_id, None)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
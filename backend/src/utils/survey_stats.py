@@ -0,0 +1,391 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+
+from ..crud.answer_aggregates import UNBUCKETED, get_survey_aggregates
+from ..data import schemas
+from ..data.enums import ItemType, PageEventType, QuestionType
+from ..data.models import (
+    Answer,
+    Item,
+    Page,
+    PageEvent,
+    ParticipantSurvey,
+    page_item_association,
+)
+from .export import (
+    _decode_json_values,
+    _decode_matrix_column,
+    _decode_numeric_column,
+)
+
+# Question types whose answers are summarized by value, all others are only
+# counted (free text)
+NUMERIC_STATS_TYPES = (QuestionType.SCALE, QuestionType.LIKERT_SCALE)
+OPTION_STATS_TYPES = (
+    QuestionType.MULTIPLE_CHOICE_SINGLE,
+    QuestionType.MULTIPLE_CHOICE_MULTIPLE,
+)
+
+
+class ValueBuckets(NamedTuple):
+    """Distinct JSON encoded answer values of an item and their aggregates."""
+
+    values: np.ndarray
+    counts: np.ndarray
+    value_sums: np.ndarray
+    value_sum_squares: np.ndarray
+
+
+EMPTY_BUCKETS = ValueBuckets(
+    np.array([], dtype=object),
+    np.array([], dtype=np.int64),
+    np.array([], dtype=float),
+    np.array([], dtype=float),
+)
+
+
+def _survey_answers(survey_id: int):
+    return select(Answer).join(Page, Page.id == Answer.page_id).where(
+        Page.survey_id == survey_id
+    )
+
+
+def _stats_items(db: Session, survey_id: int) -> List[Any]:
+    """
+    Returns the question items of a survey in page/item order, each listed once.
+    """
+    rows = db.execute(
+        select(
+            Item.id,
+            Item.resolved_title.label("title"),
+            Item.resolved_item_type.label("item_type"),
+            Item.resolved_question_type.label("question_type"),
+            Item.resolved_options.label("options"),
+            Item.resolved_scale_min.label("scale_min"),
+            Item.resolved_scale_max.label("scale_max"),
+            Item.resolved_statements.label("statements"),
+        )
+        .join(page_item_association, page_item_association.c.item_id == Item.id)
+        .join(Page, Page.id == page_item_association.c.page_id)
+        .where(Page.survey_id == survey_id)
+        .order_by(Page.order, Page.id, page_item_association.c.order)
+    ).all()
+
+    items = {}
+    for row in rows:
+        if row.item_type == ItemType.QUESTION:
+            items.setdefault(row.id, row)
+    return list(items.values())
+
+
+def _survey_aggregates(
+    db: Session, survey_id: int
+) -> Tuple[Dict[int, int], Dict[int, ValueBuckets]]:
+    """
+    Returns the number of answers per item and the value buckets of the items
+    whose answers are counted per value.
+    """
+    responses: Dict[int, int] = {}
+    grouped: Dict[int, List[Tuple]] = {}
+    for item_id, bucket, count, value_sum, value_sum_squares in (
+        get_survey_aggregates(db, survey_id)
+    ):
+        responses[item_id] = responses.get(item_id, 0) + count
+        if bucket not in (UNBUCKETED, "null"):
+            grouped.setdefault(item_id, []).append(
+                (bucket, count, value_sum, value_sum_squares)
+            )
+
+    buckets = {}
+    for item_id, rows in grouped.items():
+        values, counts, value_sums, value_sum_squares = zip(*rows)
+        buckets[item_id] = ValueBuckets(
+            np.asarray(values, dtype=object),
+            np.asarray(counts, dtype=np.int64),
+            np.asarray(value_sums, dtype=float),
+            np.asarray(value_sum_squares, dtype=float),
+        )
+    return responses, buckets
+
+
+def _numeric_stats(
+    values: np.ndarray,
+    counts: np.ndarray,
+    scale: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    totals: Optional[Tuple[float, float]] = None,
+) -> schemas.NumericStats:
+    """
+    Summarizes numeric answers given as distinct values with their counts. The
+    histogram of a scale has a bin for every point between its bounds. The
+    mean and SD are computed from the sum and sum of squares if given.
+    """
+    valid = ~np.isnan(values)
+    values, counts = values[valid], counts[valid]
+    bins, inverse = np.unique(values, return_inverse=True)
+    histogram = np.bincount(inverse, weights=counts, minlength=len(bins))
+
+    if scale is not None and None not in scale:
+        points = np.arange(scale[0], scale[1] + 1, dtype=float)
+        all_bins = np.union1d(points, bins)
+        all_histogram = np.zeros(len(all_bins))
+        all_histogram[np.searchsorted(all_bins, bins)] = histogram
+        bins, histogram = all_bins, all_histogram
+
+    n = int(counts.sum())
+    stats = schemas.NumericStats(
+        count=n,
+        histogram=[
+            schemas.ValueCount(value=int(v) if v.is_integer() else v, count=int(c))
+            for v, c in zip(bins.tolist(), histogram.tolist())
+        ],
+    )
+    if n == 0:
+        return stats
+    if totals is not None:
+        value_sum, value_sum_squares = totals
+        stats.mean = value_sum / n
+        squared_deviations = max(value_sum_squares - value_sum * value_sum / n, 0)
+    else:
+        stats.mean = float(np.average(values, weights=counts))
+        squared_deviations = np.sum(counts * (values - stats.mean) ** 2)
+    if n > 1:
+        stats.sd = float(np.sqrt(squared_deviations / (n - 1)))
+    return stats
+
+
+def _option_counts(
+    values: np.ndarray, counts: np.ndarray, options: Optional[List[str]]
+) -> List[schemas.ValueCount]:
+    """
+    Counts how often each option was chosen, including options nobody chose.
+    Answers of multiple choice (multiple) items are lists of options.
+    """
+    totals = {option: 0 for option in options or []}
+    for choice, count in zip(_decode_json_values(values), counts.tolist()):
+        for option in choice if isinstance(choice, list) else [choice]:
+            key = option if isinstance(option, str) else str(option)
+            totals[key] = totals.get(key, 0) + count
+    return [schemas.ValueCount(value=v, count=c) for v, c in totals.items()]
+
+
+def _item_stats(item: Any, responses: int, buckets: ValueBuckets) -> schemas.ItemStats:
+    stats = schemas.ItemStats(
+        item_id=item.id,
+        title=item.title,
+        question_type=item.question_type,
+        responses=responses,
+    )
+    values, counts = buckets.values, buckets.counts
+    if item.question_type in NUMERIC_STATS_TYPES:
+        stats.numeric = _numeric_stats(
+            _decode_numeric_column(values),
+            counts,
+            (item.scale_min, item.scale_max),
+            (buckets.value_sums.sum(), buckets.value_sum_squares.sum()),
+        )
+    elif item.question_type == QuestionType.MATRIX_SCALE:
+        columns = _decode_matrix_column(values, len(item.statements or []))
+        stats.statements = [_numeric_stats(column, counts) for column in columns.T]
+    elif item.question_type in OPTION_STATS_TYPES:
+        stats.options = _option_counts(values, counts, item.options)
+    return stats
+
+
+def _completion_funnel(db: Session, survey_id: int) -> List[schemas.PageFunnelStep]:
+    pages = db.execute(
+        select(Page.id, Page.name, Page.order)
+        .where(Page.survey_id == survey_id)
+        .order_by(Page.order, Page.id)
+    ).all()
+    if not pages:
+        return []
+
+    # number of participants per last answered page order
+    last_orders = (
+        _survey_answers(survey_id)
+        .with_only_columns(func.max(Page.order).label("last_order"))
+        .group_by(Answer.participant_id)
+        .subquery()
+    )
+    last = db.execute(
+        select(last_orders.c.last_order, func.count()).group_by(
+            last_orders.c.last_order
+        )
+    ).all()
+    answered = dict(
+        db.execute(
+            _survey_answers(survey_id)
+            .with_only_columns(
+                Answer.page_id, func.count(distinct(Answer.participant_id))
+            )
+            .group_by(Answer.page_id)
+        ).all()
+    )
+
+    dropped = dict(last)
+    orders = np.array([page.order for page in pages])
+    last_order = np.array(list(dropped.keys()), dtype=np.int64)
+    last_count = np.array(list(dropped.values()), dtype=np.int64)
+    # participants whose last answered page is this one or a later one
+    reached = (last_count * (last_order >= orders[:, np.newaxis])).sum(axis=1)
+
+    return [
+        schemas.PageFunnelStep(
+            page_id=page.id,
+            name=page.name,
+            order=page.order,
+            reached=int(reached[index]),
+            answered=answered.get(page.id, 0),
+            dropped=dropped.get(page.order, 0),
+        )
+        for index, page in enumerate(pages)
+    ]
+
+
+def compute_survey_stats(db: Session, survey_id: int) -> schemas.SurveyStats:
+    """
+    Aggregates the answers of a survey per item and page. The item statistics
+    are computed with NumPy from the answer aggregates, one row per item and
+    distinct value. The participant count and the completion funnel are still
+    counted from the answers.
+    """
+    items = _stats_items(db, survey_id)
+    responses, buckets = _survey_aggregates(db, survey_id)
+
+    participants = db.scalar(
+        _survey_answers(survey_id).with_only_columns(
+            func.count(distinct(Answer.participant_id))
+        )
+    )
+    submitted = db.scalar(
+        select(func.count())
+        .select_from(ParticipantSurvey)
+        .where(
+            ParticipantSurvey.survey_id == survey_id,
+            ParticipantSurvey.submit_time.is_not(None),
+        )
+    )
+
+    return schemas.SurveyStats(
+        survey_id=survey_id,
+        participants=participants,
+        submitted=submitted,
+        items=[
+            _item_stats(
+                item, responses.get(item.id, 0), buckets.get(item.id, EMPTY_BUCKETS)
+            )
+            for item in items
+        ],
+        funnel=_completion_funnel(db, survey_id),
+    )
+
+
+def _dwell_times(
+    participants: np.ndarray,
+    pages: np.ndarray,
+    leaves: np.ndarray,
+    seconds: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the page index and duration of every visit, an enter event
+    directly followed by a leave event of the same participant and page.
+    Events must be sorted by participant and time.
+    """
+    visit = (
+        (participants[:-1] == participants[1:])
+        & (pages[:-1] == pages[1:])
+        & ~leaves[:-1]
+        & leaves[1:]
+    )
+    return pages[:-1][visit], seconds[1:][visit] - seconds[:-1][visit]
+
+
+def compute_survey_progress(db: Session, survey_id: int) -> schemas.SurveyProgress:
+    """
+    Computes the visitors, dwell time and dropout per page of a survey from the
+    page events. A participant dropped out on the page of their last event,
+    unless that event is leaving the last page.
+    """
+    pages = db.execute(
+        select(Page.id, Page.name, Page.order)
+        .where(Page.survey_id == survey_id)
+        .order_by(Page.order, Page.id)
+    ).all()
+    events = db.execute(
+        select(
+            PageEvent.id,
+            PageEvent.participant_id,
+            PageEvent.page_id,
+            PageEvent.event,
+            PageEvent.timestamp,
+        )
+        .join(Page, Page.id == PageEvent.page_id)
+        .where(Page.survey_id == survey_id)
+    ).all()
+
+    # page index of every event, in page order
+    page_ids = np.array([page.id for page in pages], dtype=np.int64)
+    by_id = np.argsort(page_ids)
+    count = len(events)
+    participants = np.fromiter((e.participant_id for e in events), np.int64, count)
+    event_page_ids = np.fromiter((e.page_id for e in events), np.int64, count)
+    page_index = by_id[np.searchsorted(page_ids[by_id], event_page_ids)]
+    leaves = np.fromiter((e.event == PageEventType.LEAVE for e in events), bool, count)
+    seconds = np.fromiter((e.timestamp.timestamp() for e in events), float, count)
+
+    # events with the same timestamp, like leaving a page and entering the
+    # next one, stay in the order they were recorded
+    ids = np.fromiter((e.id for e in events), np.int64, count)
+    order = np.lexsort((ids, seconds, participants))
+    participants, page_index, leaves, seconds = (
+        participants[order],
+        page_index[order],
+        leaves[order],
+        seconds[order],
+    )
+
+    entered = page_index[~leaves]
+    visits = np.bincount(entered, minlength=len(pages))
+    # distinct (participant, page) pairs of the enter events
+    visitor_pages = np.unique(np.stack([participants[~leaves], entered]), axis=1)[1]
+    visitors = np.bincount(visitor_pages, minlength=len(pages))
+
+    dwell_pages, dwell = _dwell_times(participants, page_index, leaves, seconds)
+    by_page = np.lexsort((dwell, dwell_pages))
+    dwell_counts = np.bincount(dwell_pages, minlength=len(pages))
+    dwell_per_page = np.split(dwell[by_page], np.cumsum(dwell_counts)[:-1])
+
+    # last event of every participant
+    last = np.append(participants[1:] != participants[:-1], True)[: len(events)]
+    completed = (page_index[last] == len(pages) - 1) & leaves[last]
+    dropped = np.bincount(page_index[last][~completed], minlength=len(pages))
+
+    return schemas.SurveyProgress(
+        survey_id=survey_id,
+        participants=int(np.count_nonzero(last)),
+        completed=int(np.count_nonzero(completed)),
+        pages=[
+            schemas.PageProgress(
+                page_id=page.id,
+                name=page.name,
+                order=page.order,
+                visitors=int(visitors[index]),
+                visits=int(visits[index]),
+                mean_dwell_seconds=(
+                    float(dwell_per_page[index].mean())
+                    if len(dwell_per_page[index])
+                    else None
+                ),
+                median_dwell_seconds=(
+                    float(np.median(dwell_per_page[index]))
+                    if len(dwell_per_page[index])
+                    else None
+                ),
+                dropped=int(dropped[index]),
+            )
+            for index, page in enumerate(pages)
+        ],
+    )
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+
+from src.crud import answers as answers_crud
+from src.crud import items as items_crud
+from src.data import schemas
+from src.data.database import create_db_engine
+from src.data.models import (
+    AnswerAggregate,
+    Base,
+    Item,
+    Page,
+    Participant,
+    Project,
+    Survey,
+)
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # PostgreSQL always does, SQLite only when asked to
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture
+def db():
+    engine = create_db_engine("sqlite://")
+    event.listen(engine, "connect", _enforce_foreign_keys)
+    Base.metadata.create_all(engine)
+    with sessionmaker(autocommit=False, autoflush=False, bind=engine)() as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def ids(db):
+    project = Project(name="aggregates")
+    db.add(project)
+    db.flush()
+    survey = Survey(title="aggregates", project_id=project.id)
+    db.add(survey)
+    db.flush()
+    page = Page(name="page", survey_id=survey.id, order=1)
+    item = Item(title="scale", item_type="question", question_type="scale")
+    participants = [Participant(external_id=f"p{i}") for i in range(2)]
+    db.add_all([page, item, *participants])
+    db.commit()
+    return {
+        "page_id": page.id,
+        "item_id": item.id,
+        "participant_ids": [participant.id for participant in participants],
+    }
+
+
+def _answer(ids, participant_id, value):
+    return schemas.AnswerCreate(
+        participant_id=participant_id,
+        item_id=ids["item_id"],
+        page_id=ids["page_id"],
+        value=value,
+    )
+
+
+def _aggregates(db):
+    return db.execute(
+        select(AnswerAggregate.bucket, AnswerAggregate.count).order_by(
+            AnswerAggregate.bucket
+        )
+    ).all()
+
+
+def test_changed_answers_leave_no_empty_buckets(db, ids):
+    first, second = ids["participant_ids"]
+    answer = answers_crud.create_answer(db, _answer(ids, first, 1))
+    answers_crud.create_answer(db, _answer(ids, second, 1))
+
+    answers_crud.update_answer(db, answer.id, _answer(ids, first, 2))
+    answers_crud.create_answer(db, _answer(ids, second, 3))
+
+    assert _aggregates(db) == [("2", 1), ("3", 1)]
+
+
+def test_item_without_answers_can_be_deleted(db, ids):
+    answer_ids = [
+        answers_crud.create_answer(db, _answer(ids, participant_id, 4)).id
+        for participant_id in ids["participant_ids"]
+    ]
+    for answer_id in answer_ids:
+        assert answers_crud.delete_answer(db, answer_id)
+
+    assert _aggregates(db) == []
+    assert items_crud.delete_item(db, ids["item_id"])
+    assert db.get(Item, ids["item_id"]) is None
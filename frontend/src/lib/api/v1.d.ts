@@ -791,6 +791,14 @@ export interface components {
             dockerfile: string;
             /** Ports */
             ports: components["schemas"]["PortMapping"][] | null;
+            /** Cpu Request */
+            cpu_request?: string | null;
+            /** Cpu Limit */
+            cpu_limit?: string | null;
+            /** Memory Request */
+            memory_request?: string | null;
+            /** Memory Limit */
+            memory_limit?: string | null;
             /** Id */
             id: number;
             /** Application Id */
@@ -815,6 +823,14 @@ export interface components {
              * @default []
              */
             ports: components["schemas"]["PortMapping"][];
+            /** Cpu Request */
+            cpu_request?: string | null;
+            /** Cpu Limit */
+            cpu_limit?: string | null;
+            /** Memory Request */
+            memory_request?: string | null;
+            /** Memory Limit */
+            memory_limit?: string | null;
         };
         /** HTTPValidationError */
         HTTPValidationError: {
@@ -1100,6 +1116,11 @@ export interface components {
             redirect_url?: string | null;
             /** Allow Anonymous */
             allow_anonymous: boolean;
+            /**
+             * Warm Pool Size
+             * @default 0
+             */
+            warm_pool_size?: number;
             /** Id */
             id: number;
             /**
@@ -1129,6 +1150,11 @@ export interface components {
             redirect_url?: string | null;
             /** Allow Anonymous */
             allow_anonymous: boolean;
+            /**
+             * Warm Pool Size
+             * @default 0
+             */
+            warm_pool_size?: number;
         };
         /** PublicationUpdate */
         PublicationUpdate: {
@@ -1146,6 +1172,8 @@ export interface components {
             redirect_url?: string | null;
             /** Allow Anonymous */
             allow_anonymous?: boolean | null;
+            /** Warm Pool Size */
+            warm_pool_size?: number | null;
         };
         /**
          * QuestionType
@@ -1,5 +1,15 @@
 import { z } from 'zod';
 
+// Kubernetes quantities, left empty the operator's defaults apply
+const cpuQuantity = z
+	.string()
+	.regex(/^([0-9]+(\.[0-9]+)?|[0-9]+m)?$/, 'CPU must be cores (e.g. 1.5) or millicores (e.g. 500m)')
+	.nullish();
+const memoryQuantity = z
+	.string()
+	.regex(/^([0-9]+(\.[0-9]+)?([KMGTPE]i?)?)?$/, 'Memory must be a quantity like 512Mi or 2Gi')
+	.nullish();
+
 export const containerFormSchema = z.object({
 	id: z.number().optional(),
 	name: z
@@ -16,7 +26,11 @@ export const containerFormSchema = z.object({
 			})
 		)
 		.optional()
-		.default([])
+		.default([]),
+	cpu_request: cpuQuantity,
+	cpu_limit: cpuQuantity,
+	memory_request: memoryQuantity,
+	memory_limit: memoryQuantity
 });
 
 export type ContainerFormSchema = z.infer<typeof containerFormSchema>;
@@ -9,7 +9,8 @@ export const publicationSchema = z.object({
 	application_only: z.boolean().default(false),
 	collect_data: z.boolean().default(true),
 	redirect_url: z.string().url().optional(),
-	allow_anonymous: z.boolean().default(false)
+	allow_anonymous: z.boolean().default(false),
+	warm_pool_size: z.number().int().min(0).default(0)
 });
 
 export type PublicationSchema = typeof publicationSchema;
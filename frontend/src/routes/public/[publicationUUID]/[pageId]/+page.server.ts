@@ -5,6 +5,49 @@ import { superValidate } from 'sveltekit-superforms';
 import { zod } from 'sveltekit-superforms/adapters';
 import { API_BASE_URL } from '$lib/config';
 
+// Records the participant entering or leaving a page, for dwell time and dropout
+async function recordPageEvent(
+	fetch: typeof globalThis.fetch,
+	participantId: string | number,
+	pageId: number,
+	event: 'enter' | 'leave'
+) {
+	try {
+		await fetch(`${API_BASE_URL}/api/participants/${participantId}/page-events`, {
+			method: 'POST',
+			headers: { 'Content-Type': 'application/json' },
+			body: JSON.stringify([{ page_id: pageId, event }])
+		});
+	} catch (e) {
+		console.error('Failed to record page event', e);
+	}
+}
+
+// Fetches all answers of a participant, following the paginated listing's
+// X-Next-Cursor header until the last page
+async function fetchParticipantAnswers(
+	fetch: typeof globalThis.fetch,
+	participantId: string | number | undefined
+) {
+	const answers = [];
+	let cursor: string | null = null;
+	do {
+		const query = new URLSearchParams({ limit: '1000' });
+		if (cursor) {
+			query.set('after', cursor);
+		}
+		const response = await fetch(
+			`${API_BASE_URL}/api/participants/${participantId}/answers/?${query}`
+		);
+		if (!response.ok) {
+			break;
+		}
+		answers.push(...(await response.json()));
+		cursor = response.headers.get('X-Next-Cursor');
+	} while (cursor);
+	return answers;
+}
+
 export const load: PageServerLoad = async ({
 	params,
 	fetch,
@@ -28,16 +71,16 @@ export const load: PageServerLoad = async ({
 
 	const session = await locals.auth();
 	let participant_id = session?.user?.id;
+	if (participant_id) {
+		await recordPageEvent(fetch, participant_id, pageData.id, 'enter');
+	}
 
-	const answersResponse = await fetch(`${API_BASE_URL}/api/participants/${participant_id}/answers`);
+	const answers = await fetchParticipantAnswers(fetch, participant_id);
 	let answersData = {};
-	if (answersResponse.ok) {
-		const answers = await answersResponse.json();
-		for (const item of pageData.items) {
-			const answer = answers.find((a) => a.item_id === item.id && a.page_id === pageData.id);
-			if (answer) {
-				answersData[`item_${item.id}`] = { answer: answer.value, id: answer.id };
-			}
+	for (const item of pageData.items) {
+		const answer = answers.find((a) => a.item_id === item.id && a.page_id === pageData.id);
+		if (answer) {
+			answersData[`item_${item.id}`] = { answer: answer.value, id: answer.id };
 		}
 	}
 
@@ -124,6 +167,8 @@ export const actions: Actions = {
 			}
 		}
 
+		await recordPageEvent(fetch, participantId, pageData.id, 'leave');
+
 		if (navigation === 'finnish' && publication.redirect_url) {
 			return redirect(303, publication.redirect_url);
 		}
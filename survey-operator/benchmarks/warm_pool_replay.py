@@ -0,0 +1,324 @@
+"""
+Replay of synthetic participation arrivals against the warm pool: compares
+fixed pool sizes with the pool sized from the arrival rate. Reports how long
+participants wait for their simulation to become ready and how many CPU hours
+the idle simulations reserve.
+
+The orchestrator's handlers run unchanged against an in-memory Kubernetes API
+with a simulated clock, in which a simulation becomes ready a sampled startup
+time after it was created.
+
+Run from the survey-operator directory:
+
+    poetry run python -m benchmarks.warm_pool_replay
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import statistics
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import simulation_orchestrator as orchestrator  # noqa: E402
+from kubernetes import client  # noqa: E402
+from warm_pool_scaling import WarmPoolScaler  # noqa: E402
+
+# CPU requested by each simulation, see the deployment template
+SIMULATION_CPU = 1.5
+
+SURVEY_NAME = "project-replay"
+
+
+class FakeCluster:
+    """Deployments and the objects around them, on a simulated clock."""
+
+    def __init__(self, startup_time: Callable[[], float]):
+        self.now = 0.0
+        self.startup_time = startup_time
+        self.deployments: Dict[Tuple[str, str], SimpleNamespace] = {}
+        self.namespaces = set()
+        self._versions = itertools.count(1)
+
+    def clock(self) -> float:
+        return self.now
+
+    def _timestamp(self, seconds: float) -> datetime:
+        return datetime.fromtimestamp(seconds, timezone.utc)
+
+    def ready_at(self, deployment: SimpleNamespace) -> float:
+        return deployment.created + deployment.startup
+
+    def status(self, deployment: SimpleNamespace) -> SimpleNamespace:
+        if self.now < self.ready_at(deployment):
+            return SimpleNamespace(ready_replicas=None, conditions=[])
+        available = SimpleNamespace(
+            type="Available",
+            status="True",
+            last_transition_time=self._timestamp(self.ready_at(deployment)),
+        )
+        return SimpleNamespace(ready_replicas=1, conditions=[available])
+
+    def add_deployment(self, namespace: str, body) -> SimpleNamespace:
+        name = body["metadata"]["name"]
+        deployment = SimpleNamespace(
+            metadata=SimpleNamespace(
+                name=name,
+                namespace=namespace,
+                labels=dict(body["metadata"].get("labels") or {}),
+                annotations={},
+                resource_version=str(next(self._versions)),
+                creation_timestamp=self._timestamp(self.now),
+            ),
+            created=self.now,
+            startup=self.startup_time(),
+        )
+        self.deployments[(namespace, name)] = deployment
+        return deployment
+
+    def listed(self, deployment: SimpleNamespace) -> SimpleNamespace:
+        """Copy of the deployment as returned by the API at the current time."""
+        return SimpleNamespace(
+            metadata=SimpleNamespace(**vars(deployment.metadata)),
+            status=self.status(deployment),
+        )
+
+    def idle(self) -> List[SimpleNamespace]:
+        return [
+            deployment
+            for deployment in self.deployments.values()
+            if deployment.metadata.labels.get(orchestrator.POOL_STATE_LABEL) == "idle"
+        ]
+
+    def delete_namespace(self, namespace: str):
+        self.namespaces.discard(namespace)
+        for key in [key for key in self.deployments if key[0] == namespace]:
+            del self.deployments[key]
+
+
+def matches(labels: Dict[str, str], selector: str) -> bool:
+    return all(
+        labels.get(key) == value
+        for key, value in (term.split("=") for term in selector.split(","))
+    )
+
+
+def install_fake_apis(cluster: FakeCluster):
+    class AppsV1Api:
+        def list_deployment_for_all_namespaces(self, label_selector):
+            return SimpleNamespace(
+                items=[
+                    cluster.listed(deployment)
+                    for deployment in cluster.deployments.values()
+                    if matches(deployment.metadata.labels, label_selector)
+                ]
+            )
+
+        def create_namespaced_deployment(self, namespace, body):
+            cluster.add_deployment(namespace, body)
+
+        def patch_namespaced_deployment(self, name, namespace, body):
+            deployment = cluster.deployments.get((namespace, name))
+            if deployment is None:
+                raise client.ApiException(status=404)
+            metadata = body.get("metadata", {})
+            version = metadata.get("resourceVersion")
+            if version is not None and version != deployment.metadata.resource_version:
+                raise client.ApiException(status=409)
+            deployment.metadata.labels.update(metadata.get("labels", {}))
+            deployment.metadata.annotations.update(metadata.get("annotations", {}))
+            deployment.metadata.resource_version = str(next(cluster._versions))
+
+    class CoreV1Api:
+        def create_namespace(self, body):
+            if body.metadata.name in cluster.namespaces:
+                raise client.ApiException(status=409)
+            cluster.namespaces.add(body.metadata.name)
+
+        def delete_namespace(self, name):
+            cluster.delete_namespace(name)
+
+        def create_namespaced_persistent_volume_claim(self, namespace, body):
+            pass
+
+        def create_namespaced_service(self, namespace, body):
+            pass
+
+        def create_namespaced_config_map(self, namespace, body):
+            pass
+
+        def patch_namespaced_config_map(self, name, namespace, body):
+            pass
+
+    class NetworkingV1Api:
+        def create_namespaced_ingress(self, namespace, body):
+            pass
+
+    orchestrator.client.AppsV1Api = AppsV1Api
+    orchestrator.client.CoreV1Api = CoreV1Api
+    orchestrator.client.NetworkingV1Api = NetworkingV1Api
+
+
+def poisson_arrivals(
+    rng: random.Random, per_minute: float, start: float, end: float
+) -> List[float]:
+    arrivals = []
+    at = start
+    while per_minute > 0:
+        at += rng.expovariate(per_minute / 60)
+        if at >= end:
+            break
+        arrivals.append(at)
+    return arrivals
+
+
+def traces(rng: random.Random, duration: float) -> Dict[str, List[float]]:
+    """Arrival times in seconds, as seen for published surveys."""
+    steady = poisson_arrivals(rng, 0.5, 0, duration)
+
+    # a few participants a hour, and batches of participants recruited at once
+    waves = poisson_arrivals(rng, 0.05, 0, duration)
+    for start in (duration / 4, 3 * duration / 4):
+        waves += poisson_arrivals(rng, 8, start, start + 300)
+
+    # lab sessions, a group of participants every half hour
+    lab = []
+    for start in range(0, int(duration), 1800):
+        lab += poisson_arrivals(rng, 4, start + 600, start + 720)
+
+    return {"steady": steady, "waves": sorted(waves), "lab": lab}
+
+
+async def replay(
+    arrivals: List[float],
+    scaler: WarmPoolScaler,
+    cluster: FakeCluster,
+    pool_size: int,
+    duration: float,
+) -> Tuple[List[float], int, float]:
+    """Returns the waits of the participants, the warm starts and the idle time."""
+    scaler.clock = cluster.clock
+    orchestrator.warm_pool_scaler = scaler
+    survey = {
+        "metadata": {"name": SURVEY_NAME},
+        "spec": {
+            "buildVersion": 1,
+            "warmPoolSize": pool_size,
+            "rosVersion": "2",
+            "containers": [
+                {
+                    "name": "web",
+                    "dockerfile": "Dockerfile",
+                    "ports": [{"containerPort": 8080, "servicePort": 80}],
+                }
+            ],
+        },
+        "status": {"state": "Ready", "observedVersion": 1},
+    }
+    orchestrator.get_survey = lambda name: survey
+
+    waits = []
+    warm_starts = 0
+    idle_seconds = 0.0
+    pending = iter(arrivals)
+    arrival = next(pending, None)
+    interval = orchestrator.WARM_POOL_INTERVAL
+    for tick in itertools.count():
+        cluster.now = tick * interval
+        if cluster.now >= duration:
+            break
+        await orchestrator.maintain_warm_pool(
+            spec=survey["spec"],
+            status=survey["status"],
+            name=SURVEY_NAME,
+            patch={},
+            logger=logging.getLogger("replay"),
+        )
+
+        while arrival is not None and arrival < cluster.now + interval:
+            cluster.now = arrival
+            user_id = str(len(waits))
+            patch = {}
+            orchestrator.create_participation(
+                spec={"userId": user_id, "surveyName": SURVEY_NAME},
+                name=f"{user_id}-{SURVEY_NAME}",
+                patch=patch,
+            )
+            status = patch["status"]
+            key = (status["namespace"], status["simulation"])
+            waits.append(max(cluster.ready_at(cluster.deployments[key]) - arrival, 0.0))
+            if status["namespace"] != f"user-{user_id}":
+                warm_starts += 1
+            # the participant's simulation isn't part of the pool anymore
+            cluster.delete_namespace(status["namespace"])
+            arrival = next(pending, None)
+
+        idle_seconds += len(cluster.idle()) * interval
+
+    for deployment in cluster.idle():
+        cluster.delete_namespace(deployment.metadata.namespace)
+    return waits, warm_starts, idle_seconds
+
+
+def percentile(values: List[float], share: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(share * 100) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hours", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fixed-sizes", type=int, nargs="+", default=[0, 1, 3, 8])
+    parser.add_argument("--min-size", type=int, default=1, help="predictive pool")
+    parser.add_argument("--max-size", type=int, default=10)
+    parser.add_argument("--percentile", type=float, default=0.95)
+    parser.add_argument("--startup", type=float, default=45, help="mean seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    duration = args.hours * 3600
+    rng = random.Random(args.seed)
+    cluster = FakeCluster(lambda: max(rng.gauss(args.startup, args.startup / 4), 5))
+    install_fake_apis(cluster)
+
+    # fixed pools don't grow over their warmPoolSize
+    policies = [
+        (f"fixed {size}", size, lambda: WarmPoolScaler(max_size=0))
+        for size in args.fixed_sizes
+    ]
+    policies.append(
+        (
+            "predictive",
+            args.min_size,
+            lambda: WarmPoolScaler(
+                percentile=args.percentile,
+                startup_time=args.startup,
+                max_size=args.max_size,
+            ),
+        )
+    )
+
+    for trace, arrivals in traces(random.Random(args.seed), duration).items():
+        print(f"{trace}: {len(arrivals)} participations in {args.hours:g} h")
+        for policy, pool_size, new_scaler in policies:
+            waits, warm_starts, idle_seconds = asyncio.run(
+                replay(arrivals, new_scaler(), cluster, pool_size, duration)
+            )
+            print(
+                f"{policy:>12}: warm {warm_starts / len(waits):4.0%}"
+                f"  wait p50 {percentile(waits, 0.5):5.1f} s"
+                f"  p95 {percentile(waits, 0.95):5.1f} s"
+                f"  idle {idle_seconds / 3600 * SIMULATION_CPU:6.1f} CPU h"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+import kopf
+from kubernetes import client
+
+# Label of the jobs whose completion an operator awaits, its value names the job
+AWAITED_JOB_LABEL = "example.com/awaited-job"
+# Seconds between reads of a job's status, in case the watch missed its completion
+JOB_RECHECK_INTERVAL = int(os.getenv("JOB_RECHECK_INTERVAL") or 300)
+
+_waiters: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def _outcome(succeeded: Optional[int], failed: Optional[int]) -> Optional[bool]:
+    if succeeded is not None and succeeded > 0:
+        return True
+    if failed is not None and failed > 0:
+        return False
+    return None
+
+
+@kopf.on.event("batch", "v1", "jobs", labels={AWAITED_JOB_LABEL: kopf.PRESENT})
+async def job_event(name, namespace, status, **kwargs):
+    waiter = _waiters.get((namespace, name))
+    outcome = _outcome(status.get("succeeded"), status.get("failed"))
+    if waiter is not None and not waiter.done() and outcome is not None:
+        waiter.set_result(outcome)
+
+
+async def wait_for_job(name: str, namespace: str) -> bool:
+    """
+    Waits until the job succeeded (True) or failed (False). The job events
+    from the operator's watch resolve the wait, so it ends as soon as the job
+    does and waiting for many jobs costs no requests.
+    """
+    batch_v1 = client.BatchV1Api()
+    waiter = asyncio.get_running_loop().create_future()
+    _waiters[(namespace, name)] = waiter
+    try:
+        while True:
+            # a job that finished before the waiter was added sends no more events
+            job = await asyncio.to_thread(
+                batch_v1.read_namespaced_job_status, name, namespace
+            )
+            outcome = _outcome(job.status.succeeded, job.status.failed)
+            if outcome is not None:
+                return outcome
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(waiter), JOB_RECHECK_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _waiters.pop((namespace, name), None)
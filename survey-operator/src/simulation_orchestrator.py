@@ -1,12 +1,20 @@
 import asyncio
+import hashlib
+import json
 import logging
 import os
-from typing import Dict, Tuple
+import secrets
+import threading
+from typing import Dict, Optional, Tuple
 
 import kopf
 import yaml
 from jinja2 import Template
 from kubernetes import client, config
+from kubernetes.utils import parse_quantity
+
+from job_watch import AWAITED_JOB_LABEL, wait_for_job
+from warm_pool_scaling import WarmPoolScaler
 
 logging.basicConfig(level=logging.INFO)
 
@@ -28,6 +36,27 @@ SSL_ISSUER = os.getenv("SSL_ISSUER")
 MINIO_USER = os.getenv("MINIO_USER")
 MINIO_PASSWORD = os.getenv("MINIO_PASSWORD")
 
+# Seconds between checks of the survey's warm pools of idle simulations
+WARM_POOL_INTERVAL = int(os.getenv("WARM_POOL_INTERVAL") or 10)
+# Labels of warm pool deployments: the survey, idle/claimed, the build version
+# and a hash of the containers' resources
+WARM_POOL_LABEL = "example.com/warm-pool"
+POOL_STATE_LABEL = "example.com/pool-state"
+BUILD_VERSION_LABEL = "example.com/build-version"
+RESOURCES_LABEL = "example.com/resources"
+PARTICIPATION_ANNOTATION = "example.com/participation"
+
+# Resources of containers without requests and limits in the survey
+DEFAULT_RESOURCES = {
+    "requests": {"cpu": "1.5", "memory": "1536Mi"},
+    "limits": {"cpu": "2", "memory": "2048Mi"},
+}
+
+# claiming and removing idle simulations must not interleave
+_pool_lock = threading.Lock()
+# sizes the warm pools from the arrival rate of participations
+warm_pool_scaler = WarmPoolScaler()
+
 
 def get_survey(name):
     api = client.CustomObjectsApi()
@@ -58,67 +87,121 @@ def get_rosbag_config(ros_version, topics):
     return image, cmd, stop_cmd
 
 
-@kopf.on.create("example.com", "v1", "participations")
-def create_participation(spec, name, patch, **kwargs):
-    logging.info(f"Creating participation {name} with spec: {spec}")
+def get_service_ports(survey) -> Dict[str, Tuple[int, int]]:
+    """(service port, container port) per container, the last port is exposed."""
+    container_service_ports: Dict[str, Tuple[int, int]] = {}
+    for container_spec in survey["spec"]["containers"]:
+        for port in container_spec.get("ports", []):
+            container_service_ports[container_spec["name"]] = (
+                port["servicePort"],
+                port["containerPort"],
+            )
+    return container_service_ports
+
+
+def get_container_resources(container_spec, overrides=None):
+    """
+    Requests and limits of a container, from the survey or the defaults, with
+    the participation's overrides applied to every container.
+    """
+    resources = container_spec.get("resources") or {}
+    if not resources.get("requests") and not resources.get("limits"):
+        resources = DEFAULT_RESOURCES
+    resources = {
+        "requests": dict(resources.get("requests") or {}),
+        "limits": dict(resources.get("limits") or {}),
+    }
+    if overrides:
+        resources["requests"].update(overrides.get("resourceRequests") or {})
+        resources["limits"].update(overrides.get("resourceLimits") or {})
+
+    # a lowered limit lowers the request too, the API rejects requests over limits
+    for resource, limit in resources["limits"].items():
+        request = resources["requests"].get(resource)
+        if request is not None and parse_quantity(request) > parse_quantity(limit):
+            resources["requests"][resource] = limit
+    return {kind: values for kind, values in resources.items() if values}
+
+
+def get_resources_hash(survey) -> str:
+    resources = [
+        get_container_resources(container_spec)
+        for container_spec in survey["spec"]["containers"]
+    ]
+    return hashlib.sha256(json.dumps(resources).encode()).hexdigest()[:16]
+
+
+def is_current_simulation(deployment, survey) -> bool:
+    """Whether the warm simulation runs the survey's images and resources."""
+    labels = deployment.metadata.labels
+    return labels.get(BUILD_VERSION_LABEL) == str(
+        survey["status"].get("observedVersion")
+    ) and labels.get(RESOURCES_LABEL) == get_resources_hash(survey)
+
+
+def create_simulation(
+    name: str,
+    namespace: str,
+    survey,
+    user_id: Optional[str],
+    labels: Optional[Dict[str, str]] = None,
+    overrides=None,
+):
+    """
+    Creates the namespace, volume, deployment and services of a simulation.
+    Without a user id, as for warm pool simulations, the containers read it
+    from /etc/participant/user-id once the simulation is claimed. It's kept in
+    the simulation's participant config map, so pods that are recreated after
+    the claim see it too.
+    """
     api = client.CoreV1Api()
     apps_api = client.AppsV1Api()
-    networking_v1_api = client.NetworkingV1Api()
 
-    survey = get_survey(spec["surveyName"])
-
-    user_ns = f"user-{spec["userId"]}"
     try:
         api.create_namespace(
-            client.V1Namespace(metadata=client.V1ObjectMeta(name=user_ns))
+            client.V1Namespace(metadata=client.V1ObjectMeta(name=namespace))
         )
     except client.rest.ApiException as e:
         if e.status != 409:
             raise
 
     containers = ""
-    container_service_ports: Dict[str, Tuple[int, int]] = {}
 
-    # TODO: configurable resource requests/limits
     for container_spec in survey["spec"]["containers"]:
+        resources = get_container_resources(container_spec, overrides)
         containers += f"""
         - name: {container_spec["name"]}
           image: registry:5000/{survey['metadata']['name']}-{container_spec['name']}:latest
-          resources:
-            limits:
-              cpu: 2.0
-              memory: 2048Mi
-            requests:
-              cpu: 1.5
-              memory: 1536Mi
+          resources: {json.dumps(resources)}
           env:
             - name: USER_ID
-              value: \"{spec['userId']}\"
+              value: \"{user_id or ''}\""""
+        if user_id is None:
+            containers += """
+          volumeMounts:
+            - name: participant
+              mountPath: /etc/participant"""
+        containers += """
           ports:"""
         for port in container_spec.get("ports", []):
             containers += f"""
             - containerPort: {port['containerPort']}"""
 
-            container_service_ports[container_spec["name"]] = (
-                port["servicePort"],
-                port["containerPort"],
-            )
-
     pvc = client.V1PersistentVolumeClaim(
-        metadata=client.V1ObjectMeta(name=f"{name}-data", namespace=user_ns),
+        metadata=client.V1ObjectMeta(name=f"{name}-data", namespace=namespace),
         spec=client.V1PersistentVolumeClaimSpec(
             access_modes=["ReadWriteOnce"],
             resources=client.V1ResourceRequirements(requests={"storage": "5Gi"}),
         ),
     )
     try:
-        api.create_namespaced_persistent_volume_claim(namespace=user_ns, body=pvc)
+        api.create_namespaced_persistent_volume_claim(namespace=namespace, body=pvc)
     except client.ApiException as e:
         if e.status != 409:
             raise e
 
         logging.warning(
-            f"Volume {name}-data already exists in namespace {user_ns}, reusing!"
+            f"Volume {name}-data already exists in namespace {namespace}, reusing!"
         )
 
     ros_version = survey["spec"]["rosVersion"]
@@ -129,16 +212,31 @@ def create_participation(spec, name, patch, **kwargs):
 
     deployment_yaml = DEPLOYMENT_TEMPLATE.render(
         name=name,
-        namespace=user_ns,
+        namespace=namespace,
         containers=containers,
         rosbag_image=rosbag_image,
         rosbag_cmd=rosbag_cmd,
         stop_command=rosbag_stop_cmd,
     )
     deployment = yaml.safe_load(deployment_yaml)
-    apps_api.create_namespaced_deployment(namespace=user_ns, body=deployment)
+    if labels:
+        deployment["metadata"]["labels"] = labels
+    if user_id is None:
+        config_map = client.V1ConfigMap(
+            metadata=client.V1ObjectMeta(name=f"{name}-participant"),
+            data={"user-id": ""},
+        )
+        try:
+            api.create_namespaced_config_map(namespace=namespace, body=config_map)
+        except client.ApiException as e:
+            if e.status != 409:
+                raise
+        deployment["spec"]["template"]["spec"]["volumes"].append(
+            {"name": "participant", "configMap": {"name": f"{name}-participant"}}
+        )
+    apps_api.create_namespaced_deployment(namespace=namespace, body=deployment)
 
-    for container_name, (port, target_port) in container_service_ports.items():
+    for container_name, (port, target_port) in get_service_ports(survey).items():
         # skip containers without service ports
         if port is None:
             continue
@@ -152,12 +250,22 @@ def create_participation(spec, name, patch, **kwargs):
         service_yaml = SERVICE_TEMPLATE.render(
             name=service_name,
             deployment_name=name,
-            namespace=user_ns,
+            namespace=namespace,
             ports=service_ports,
         )
         service = yaml.safe_load(service_yaml)
-        api.create_namespaced_service(namespace=user_ns, body=service)
-        host = f"{spec['userId']}{container_name}{target_port}.{DOAMIN}"
+        api.create_namespaced_service(namespace=namespace, body=service)
+
+
+def create_ingresses(name: str, namespace: str, user_id: str, survey):
+    """Routes the participant's hosts to the services of the simulation."""
+    networking_v1_api = client.NetworkingV1Api()
+
+    for container_name, (port, target_port) in get_service_ports(survey).items():
+        if port is None:
+            continue
+
+        host = f"{user_id}{container_name}{target_port}.{DOAMIN}"
         tls = f"""  tls:
     - secretName: tls-secret
       hosts:
@@ -167,24 +275,212 @@ def create_participation(spec, name, patch, **kwargs):
 
         ingress_yaml = INGRESS_TEMPLATE.render(
             name=f"ingress-{name}-{container_name}-{target_port}",
-            namespace=user_ns,
+            namespace=namespace,
             host=host,
-            serviceName=service_name,
+            serviceName=f"service-{name}-{container_name}",
             servicePort=port,
             tls=tls if SSL_ENABLED else "",
             annotations=redirect if SSL_ENABLED else "",
         )
         ingress = yaml.safe_load(ingress_yaml)
-        networking_v1_api.create_namespaced_ingress(namespace=user_ns, body=ingress)
+        networking_v1_api.create_namespaced_ingress(namespace=namespace, body=ingress)
+
+
+def list_idle_simulations(survey_name: str):
+    apps_api = client.AppsV1Api()
+    deployments = apps_api.list_deployment_for_all_namespaces(
+        label_selector=f"{WARM_POOL_LABEL}={survey_name},{POOL_STATE_LABEL}=idle"
+    )
+    # ready simulations first
+    return sorted(deployments.items, key=lambda d: not d.status.ready_replicas)
+
+
+def claim_warm_simulation(
+    survey, participation: str, user_id: str
+) -> Optional[Tuple[str, str]]:
+    """
+    Marks an idle simulation of the survey's warm pool, running the current
+    images and resources, as claimed by the participation and returns its
+    namespace and name.
+    """
+    api = client.CoreV1Api()
+    apps_api = client.AppsV1Api()
+
+    with _pool_lock:
+        for deployment in list_idle_simulations(survey["metadata"]["name"]):
+            if not is_current_simulation(deployment, survey):
+                continue
+            try:
+                # fails if the simulation was changed since it was listed
+                apps_api.patch_namespaced_deployment(
+                    deployment.metadata.name,
+                    deployment.metadata.namespace,
+                    {
+                        "metadata": {
+                            "resourceVersion": deployment.metadata.resource_version,
+                            "labels": {POOL_STATE_LABEL: "claimed"},
+                            "annotations": {PARTICIPATION_ANNOTATION: participation},
+                        }
+                    },
+                )
+            except client.ApiException as e:
+                if e.status != 409:
+                    raise
+                continue
+            break
+        else:
+            return None
+
+    name = deployment.metadata.name
+    namespace = deployment.metadata.namespace
+    # mounted into the containers, the kubelet updates running pods' copies
+    api.patch_namespaced_config_map(
+        f"{name}-participant", namespace, {"data": {"user-id": user_id}}
+    )
+    return namespace, name
+
+
+def create_warm_simulation(survey):
+    survey_name = survey["metadata"]["name"]
+    # namespace names are limited to 63 characters
+    name = f"{survey_name[:50]}-warm-{secrets.token_hex(3)}"
+    labels = {
+        WARM_POOL_LABEL: survey_name,
+        POOL_STATE_LABEL: "idle",
+        BUILD_VERSION_LABEL: str(survey["status"]["observedVersion"]),
+        RESOURCES_LABEL: get_resources_hash(survey),
+    }
+    create_simulation(name, name, survey, None, labels)
+
+
+def startup_time(deployment) -> Optional[float]:
+    """Seconds from creating the deployment until it became available."""
+    for condition in deployment.status.conditions or []:
+        if condition.type == "Available" and condition.status == "True":
+            created = deployment.metadata.creation_timestamp
+            return (condition.last_transition_time - created).total_seconds()
+    return None
+
+
+def remove_idle_simulations(deployments):
+    api = client.CoreV1Api()
+    apps_api = client.AppsV1Api()
+    with _pool_lock:
+        for deployment in deployments:
+            try:
+                # not listed as idle anymore while its namespace terminates
+                apps_api.patch_namespaced_deployment(
+                    deployment.metadata.name,
+                    deployment.metadata.namespace,
+                    {
+                        "metadata": {
+                            "resourceVersion": deployment.metadata.resource_version,
+                            "labels": {POOL_STATE_LABEL: "removed"},
+                        }
+                    },
+                )
+            except client.ApiException as e:
+                # claimed or removed since it was listed
+                if e.status in (404, 409):
+                    continue
+                raise
+            api.delete_namespace(name=deployment.metadata.namespace)
+
+
+@kopf.timer("example.com", "v1", "surveys", interval=WARM_POOL_INTERVAL)
+async def maintain_warm_pool(spec, status, name, patch, logger, **kwargs):
+    build_version = status.get("observedVersion")
+    survey = {"metadata": {"name": name}, "spec": dict(spec), "status": dict(status)}
+    idle = await asyncio.to_thread(list_idle_simulations, name)
+    current = [d for d in idle if is_current_simulation(d, survey)]
+
+    startup_times = {d.metadata.name: startup_time(d) for d in current}
+    warm_pool_scaler.record_startup_times(
+        name, {key: value for key, value in startup_times.items() if value is not None}
+    )
+    # warmPoolSize is the least, more simulations are kept while many arrive,
+    # surveys without a warmPoolSize don't get a pool
+    size = warm_pool_scaler.target_size(
+        name, spec.get("warmPoolSize", 0), WARM_POOL_INTERVAL
+    )
+    if status.get("state") not in ("Ready", "Started") or build_version is None:
+        # there are no images to start simulations from
+        size = 0
+
+    # simulations of older builds or resources and the ones over the pool size,
+    # not ready first
+    surplus = [deployment for deployment in idle if deployment not in current]
+    surplus += current[size:]
+    current = current[:size]
+    if surplus:
+        logger.info(f"Removing {len(surplus)} idle simulations of survey {name}")
+        await asyncio.to_thread(remove_idle_simulations, surplus)
+
+    missing = size - len(current)
+    if missing > 0:
+        logger.info(f"Starting {missing} warm simulations for survey {name}")
+        await asyncio.gather(
+            *(asyncio.to_thread(create_warm_simulation, survey) for _ in range(missing))
+        )
+
+    patch["status"] = {
+        "warmPool": {
+            "size": size,
+            "ready": sum(1 for d in current if d.status.ready_replicas),
+            # participations per minute
+            "arrivalRate": round(warm_pool_scaler.arrival_rate(name) * 60, 2),
+        }
+    }
+
 
-    patch["status"] = {"phase": "Running", "rosbagFile": "simulation.bag"}
+@kopf.on.delete("example.com", "v1", "surveys", optional=True)
+async def remove_warm_pool(name, logger, **kwargs):
+    warm_pool_scaler.forget(name)
+    idle = await asyncio.to_thread(list_idle_simulations, name)
+    if idle:
+        logger.info(f"Removing the warm pool of survey {name}")
+        await asyncio.to_thread(remove_idle_simulations, idle)
 
 
-def create_minio_upload_job(name, namespace, survey_name, rosbag_file):
+@kopf.on.create("example.com", "v1", "participations")
+def create_participation(spec, name, patch, **kwargs):
+    logging.info(f"Creating participation {name} with spec: {spec}")
+
+    survey = get_survey(spec["surveyName"])
+    warm_pool_scaler.record_arrival(survey["metadata"]["name"])
+
+    overrides = spec.get("overrides") or {}
+    claimed = None
+    # warm simulations run with the survey's resources
+    if not overrides.get("resourceRequests") and not overrides.get("resourceLimits"):
+        claimed = claim_warm_simulation(survey, name, spec["userId"])
+    if claimed is not None:
+        namespace, simulation = claimed
+        logging.info(f"Participation {name} claimed warm simulation {simulation}")
+    else:
+        namespace, simulation = f"user-{spec["userId"]}", name
+        create_simulation(
+            simulation, namespace, survey, spec["userId"], overrides=overrides
+        )
+    create_ingresses(simulation, namespace, spec["userId"], survey)
+
+    patch["status"] = {
+        "phase": "Running",
+        "rosbagFile": "simulation.bag",
+        "namespace": namespace,
+        "simulation": simulation,
+    }
+
+
+def create_minio_upload_job(name, namespace, survey_name, rosbag_file, upload_dir):
     batch_v1 = client.BatchV1Api()
 
     job = client.V1Job(
-        metadata=client.V1ObjectMeta(name=f"{name}-minio-upload", namespace=namespace),
+        metadata=client.V1ObjectMeta(
+            name=f"{name}-minio-upload",
+            namespace=namespace,
+            labels={AWAITED_JOB_LABEL: "rosbag-upload"},
+        ),
         spec=client.V1JobSpec(
             template=client.V1PodTemplateSpec(
                 spec=client.V1PodSpec(
@@ -195,7 +491,7 @@ def create_minio_upload_job(name, namespace, survey_name, rosbag_file):
                             command=["/bin/sh", "-c"],                            
                             args=[
                                 f"mc alias set myminio https://myminio-hl.minio-tenant.svc.cluster.local:9000 {MINIO_USER} {MINIO_PASSWORD} && "
-                                f"mc mirror /data/{rosbag_file} myminio/rosbags/{survey_name}/{namespace}/{rosbag_file}"
+                                f"mc mirror /data/{rosbag_file} myminio/rosbags/{survey_name}/{upload_dir}/{rosbag_file}"
                             ],
                             env=[],
                             volume_mounts=[
@@ -222,10 +518,8 @@ def create_minio_upload_job(name, namespace, survey_name, rosbag_file):
 
 @kopf.on.delete("example.com", "v1", "participations")
 async def cleanup_simulation(spec, name, namespace, logger, status, **kwargs):
-    user_ns = f"user-{spec["userId"]}"
     api = client.CoreV1Api()
     apps_api = client.AppsV1Api()
-    batch_v1 = client.BatchV1Api()
     networking_v1_api = client.NetworkingV1Api()
 
     if status is None:
@@ -233,41 +527,54 @@ async def cleanup_simulation(spec, name, namespace, logger, status, **kwargs):
         return
 
     rosbag_file = status["rosbagFile"]
-    apps_api.delete_namespaced_deployment(namespace=user_ns, name=name)
-
-    job = create_minio_upload_job(name, user_ns, spec["surveyName"], rosbag_file)
+    # a claimed warm simulation keeps the namespace and name it was started with
+    user_dir = f"user-{spec["userId"]}"
+    user_ns = status.get("namespace", user_dir)
+    simulation = status.get("simulation", name)
+    await asyncio.to_thread(
+        apps_api.delete_namespaced_deployment, namespace=user_ns, name=simulation
+    )
 
-    while True:
-        job = batch_v1.read_namespaced_job(job.metadata.name, namespace)
-        if job.status.succeeded is not None and job.status.succeeded > 0:
-            logger.info(f"Copy rosbag job {job.metadata.name} succeeded")
-            break
-        elif job.status.failed is not None and job.status.failed > 0:
-            logger.error(f"Copy rosbag job {job.metadata.name} failed")
-            return False
+    job = await asyncio.to_thread(
+        create_minio_upload_job,
+        simulation,
+        user_ns,
+        spec["surveyName"],
+        rosbag_file,
+        user_dir,
+    )
 
-        logger.info(f"Waiting for copy rosbag job {job.metadata.name} to complete")
-        await asyncio.sleep(10)    
+    logger.info(f"Waiting for copy rosbag job {job.metadata.name} to complete")
+    if not await wait_for_job(job.metadata.name, user_ns):
+        logger.error(f"Copy rosbag job {job.metadata.name} failed")
+        return False
+    logger.info(f"Copy rosbag job {job.metadata.name} succeeded")
 
-    def check_delete_resource(entity, namespace, delete_fn):
+    async def check_delete_resource(entity, namespace, delete_fn):
         if hasattr(entity, "metadata") and hasattr(entity.metadata, "name"):
-            if name in entity.metadata.name:
-                delete_fn(name=entity.metadata.name, namespace=namespace)
+            if simulation in entity.metadata.name:
+                await asyncio.to_thread(
+                    delete_fn, name=entity.metadata.name, namespace=namespace
+                )
 
-    services = api.list_namespaced_service(namespace=user_ns)
+    services = await asyncio.to_thread(api.list_namespaced_service, namespace=user_ns)
     for service in services.items:
-        check_delete_resource(service, user_ns, api.delete_namespaced_service)
+        await check_delete_resource(service, user_ns, api.delete_namespaced_service)
 
-    ingress_rules = networking_v1_api.list_namespaced_ingress(namespace=user_ns)
+    ingress_rules = await asyncio.to_thread(
+        networking_v1_api.list_namespaced_ingress, namespace=user_ns
+    )
     for ingress in ingress_rules.items:
-        check_delete_resource(
+        await check_delete_resource(
             ingress, user_ns, networking_v1_api.delete_namespaced_ingress
         )
 
-    api.delete_namespaced_persistent_volume_claim(
-        name=f"{name}-data", namespace=user_ns
+    await asyncio.to_thread(
+        api.delete_namespaced_persistent_volume_claim,
+        name=f"{simulation}-data",
+        namespace=user_ns,
     )
-    api.delete_namespace(name=user_ns)
+    await asyncio.to_thread(api.delete_namespace, name=user_ns)
 
 
 if __name__ == "__main__":
@@ -3,13 +3,55 @@ import base64
 import logging
 import os
 from datetime import datetime, timezone
+from typing import Dict, Optional
 from urllib.parse import urlparse
 
 import kopf
 from kubernetes import client, config
 
+from job_watch import AWAITED_JOB_LABEL, wait_for_job
+
 logging.basicConfig(level=logging.DEBUG)
 
+# The repo is cloned by git into a volume shared with one kaniko container per
+# image, the debug image of kaniko has a shell to skip unchanged images
+GIT_IMAGE = os.getenv("GIT_IMAGE") or "alpine/git:latest"
+KANIKO_IMAGE = os.getenv("KANIKO_IMAGE") or "gcr.io/kaniko-project/executor:debug"
+# Clone only the branch's latest commit instead of the whole history
+GIT_SHALLOW_CLONE = (os.getenv("GIT_SHALLOW_CLONE") or "true").lower() in ("1", "true")
+# Reuse the layers of earlier builds, stored next to the images in the registry
+KANIKO_CACHE = (os.getenv("KANIKO_CACHE") or "true").lower() in ("1", "true")
+KANIKO_CACHE_TTL = os.getenv("KANIKO_CACHE_TTL") or "336h"
+
+CLONE_SCRIPT = """set -e
+git clone $CLONE_ARGS ${GIT_BRANCH:+--branch "$GIT_BRANCH"} "$GIT_URL" /workspace/src
+git -C /workspace/src rev-parse 'HEAD^{tree}' > /workspace/tree
+"""
+# The image's hash covers the whole build context and the Dockerfile's path,
+# an image with the hash of the last successful build isn't built again as
+# long as the registry still has it
+BUILD_SCRIPT = """TREE=$(cat /workspace/tree)
+HASH=$(echo "$TREE $DOCKERFILE" | sha256sum | cut -d ' ' -f 1)
+echo -n "$HASH" > /dev/termination-log
+if [ "$HASH" = "$PREVIOUS_HASH" ]; then
+  if wget -q --spider --header "Accept: $MANIFEST_TYPES" "$MANIFEST_URL"; then
+    echo "Context and Dockerfile unchanged since the last build, skipping"
+    exit 0
+  fi
+  echo "Context and Dockerfile unchanged, but the image is missing, building"
+fi
+exec /kaniko/executor "$@"
+"""
+# Manifests kaniko pushes, the registry answers 404 for types not accepted
+MANIFEST_TYPES = ", ".join(
+    [
+        "application/vnd.docker.distribution.manifest.v2+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.manifest.v1+json",
+        "application/vnd.oci.image.index.v1+json",
+    ]
+)
+
 
 @kopf.on.create("example.com", "v1", "surveys")
 @kopf.on.update("example.com", "v1", "surveys")
@@ -19,12 +61,13 @@ async def reconcile_survey(spec, status, name, logger, **kwargs):
     started = spec.get("started", False)
     core_v1 = client.CoreV1Api()
     try:
-        core_v1.read_namespace(name)
+        await asyncio.to_thread(core_v1.read_namespace, name)
     except client.rest.ApiException as e:
         if e.status == 404:
             logger.info(f"Creating namespace for survey {name}")
-            core_v1.create_namespace(
-                client.V1Namespace(metadata=client.V1ObjectMeta(name=name))
+            await asyncio.to_thread(
+                core_v1.create_namespace,
+                client.V1Namespace(metadata=client.V1ObjectMeta(name=name)),
             )
             # we do not need role bindings as our simulation-orchestrator role is clusterwide
             # create_role_binding("simulation-orchestrator", name)
@@ -41,9 +84,10 @@ async def reconcile_survey(spec, status, name, logger, **kwargs):
             name, {"state": "Building", "observedVersion": build_version}
         )
 
-        success = await build_survey(name, spec, name, logger)
+        previous_hashes = status.get("imageHashes") or {}
+        image_hashes = await build_survey(name, spec, name, previous_hashes, logger)
 
-        if success:
+        if image_hashes is not None:
             await update_status(
                 name,
                 {
@@ -51,13 +95,23 @@ async def reconcile_survey(spec, status, name, logger, **kwargs):
                     "lastSuccessfulBuild": datetime.now(timezone.utc)
                     .isoformat()
                     .replace("+00:00", "Z"),
+                    # a merge patch, the hashes of removed containers are
+                    # set to null to delete them
+                    "imageHashes": {
+                        **dict.fromkeys(previous_hashes),
+                        **image_hashes,
+                    },
                 },
             )
         else:
             await update_status(name, {"state": "Failed"})
 
 
-def create_kaniko_job(name, spec, namespace):
+def kaniko_container_name(container) -> str:
+    return f"kaniko-{container['name'].lower()}"
+
+
+def create_kaniko_job(name, spec, namespace, image_hashes: Dict[str, str]):
     logging.info(f"NAMESPACE: {namespace}")
     logging.info(f"Creating Kaniko job for survey: {name}")
     batch_v1 = client.BatchV1Api()
@@ -86,42 +140,81 @@ def create_kaniko_job(name, spec, namespace):
             git_url = f"oauth2:{token}@{git_url}"
 
     kaniko_containers = []
-
-    logging.error(f"GIT URL: {git_url}")
-    logging.error(f"git://{git_url}#refs/heads/{git_repo['branch']}")
-    head_refs = (
-        f"#refs/heads/{git_repo['branch']}"
-        if git_repo["branch"] is not None and git_repo["branch"] != ""
-        else ""
+    workspace = client.V1VolumeMount(name="workspace", mount_path="/workspace")
+
+    scheme = parsed_url.scheme or "https"
+    clone_args = "--depth 1 --single-branch" if GIT_SHALLOW_CLONE else ""
+    clone_container = client.V1Container(
+        name="clone",
+        image=GIT_IMAGE,
+        command=["/bin/sh", "-c", CLONE_SCRIPT],
+        env=env
+        + [
+            client.V1EnvVar(name="GIT_URL", value=f"{scheme}://{git_url}"),
+            client.V1EnvVar(name="GIT_BRANCH", value=git_repo["branch"] or ""),
+            client.V1EnvVar(name="CLONE_ARGS", value=clone_args),
+        ],
+        volume_mounts=[workspace],
     )
 
     for container in containers:
+        repository = f"{name}-{container['name']}"
+        destination = f"registry:5000/{repository}"
         kaniko_cmd = [
-            f"--context=git://{git_url}{head_refs}",
-            f"--destination=registry:5000/{name}-{container['name']}:latest",
+            "--context=dir:///workspace/src",
+            f"--destination={destination}:latest",
             f"--dockerfile={container['dockerfile']}",
             "--insecure",
             "--skip-tls-verify",
         ]
+        if KANIKO_CACHE:
+            kaniko_cmd += [
+                "--cache=true",
+                f"--cache-repo={destination}/cache",
+                f"--cache-ttl={KANIKO_CACHE_TTL}",
+            ]
 
         kaniko_containers.append(
             client.V1Container(
-                name=f"kaniko-{container['name'].lower()}",
-                image="gcr.io/kaniko-project/executor:latest",
+                name=kaniko_container_name(container),
+                image=KANIKO_IMAGE,
+                command=["/busybox/sh", "-c", BUILD_SCRIPT, "kaniko"],
                 args=kaniko_cmd,
-                env=env,
+                env=env
+                + [
+                    client.V1EnvVar(name="DOCKERFILE", value=container["dockerfile"]),
+                    client.V1EnvVar(
+                        name="PREVIOUS_HASH",
+                        value=image_hashes.get(container["name"], ""),
+                    ),
+                    client.V1EnvVar(
+                        name="MANIFEST_URL",
+                        value=f"http://registry:5000/v2/{repository}/manifests/latest",
+                    ),
+                    client.V1EnvVar(name="MANIFEST_TYPES", value=MANIFEST_TYPES),
+                ],
+                volume_mounts=[workspace],
             )
         )
 
     job_name = f"build-{name.lower()}-{int(datetime.now().timestamp())}"
 
     job = client.V1Job(
-        metadata=client.V1ObjectMeta(name=job_name, labels={"project-name": name}),
+        metadata=client.V1ObjectMeta(
+            name=job_name, labels={"project-name": name, AWAITED_JOB_LABEL: "build"}
+        ),
         spec=client.V1JobSpec(
             template=client.V1PodTemplateSpec(
                 spec=client.V1PodSpec(
+                    init_containers=[clone_container],
                     containers=kaniko_containers,
                     restart_policy="Never",
+                    volumes=[
+                        client.V1Volume(
+                            name="workspace",
+                            empty_dir=client.V1EmptyDirVolumeSource(),
+                        )
+                    ],
                 )
             ),
             ttl_seconds_after_finished=300,
@@ -131,28 +224,62 @@ def create_kaniko_job(name, spec, namespace):
     return batch_v1.create_namespaced_job(namespace, job)
 
 
-async def build_survey(name, spec, namespace, logger):
-    batch_v1 = client.BatchV1Api()
+def read_image_hashes(job_name, namespace, containers) -> Dict[str, str]:
+    """The hashes the kaniko containers of the job's succeeded pod reported."""
+    core_v1 = client.CoreV1Api()
+    pods = core_v1.list_namespaced_pod(namespace, label_selector=f"job-name={job_name}")
+    messages = {}
+    for pod in pods.items:
+        if pod.status.phase != "Succeeded":
+            continue
+        for container_status in pod.status.container_statuses or []:
+            terminated = container_status.state.terminated
+            if terminated is not None and terminated.message:
+                messages[container_status.name] = terminated.message.strip()
+    return {
+        container["name"]: messages[kaniko_container_name(container)]
+        for container in containers
+        if kaniko_container_name(container) in messages
+    }
+
+
+async def build_survey(
+    name, spec, namespace, image_hashes: Dict[str, str], logger
+) -> Optional[Dict[str, str]]:
+    """
+    Builds the survey's images and returns their hashes, or None if the build
+    failed. Images with the hash of the last successful build are skipped.
+    """
     logger.info(f"Starting build process for survey {name}")
 
-    build_job = create_kaniko_job(name, spec, namespace)
+    build_job = await asyncio.to_thread(
+        create_kaniko_job, name, spec, namespace, image_hashes
+    )
+    job_name = build_job.metadata.name
 
-    while True:
-        job = batch_v1.read_namespaced_job(build_job.metadata.name, namespace)
-        if job.status.succeeded is not None and job.status.succeeded > 0:
-            logger.info(f"Build job {job.metadata.name} succeeded")
-            return True
-        elif job.status.failed is not None and job.status.failed > 0:
-            logger.error(f"Build job {job.metadata.name} failed")
-            return False
+    logger.info(f"Waiting for build job {job_name} to complete")
+    if not await wait_for_job(job_name, namespace):
+        logger.error(f"Build job {job_name} failed")
+        return None
 
-        logger.info(f"Waiting for build job {job.metadata.name} to complete")
-        await asyncio.sleep(10)
+    built_hashes = await asyncio.to_thread(
+        read_image_hashes, job_name, namespace, spec["containers"]
+    )
+    unchanged = [
+        container
+        for container, image_hash in built_hashes.items()
+        if image_hashes.get(container) == image_hash
+    ]
+    logger.info(
+        f"Build job {job_name} succeeded, unchanged images: {', '.join(unchanged)}"
+    )
+    return built_hashes
 
 
 async def update_status(name, patch):
     api = client.CustomObjectsApi()
-    api.patch_cluster_custom_object(
+    await asyncio.to_thread(
+        api.patch_cluster_custom_object,
         group="example.com",
         version="v1",
         plural="surveys",
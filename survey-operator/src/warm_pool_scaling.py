@@ -0,0 +1,130 @@
+import math
+import os
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# Seconds over which participation arrivals are averaged, older arrivals
+# count exponentially less. The short window follows bursts of arrivals, the
+# long one keeps the pool over the gaps between arrivals.
+ARRIVAL_RATE_SHORT_WINDOW = float(os.getenv("ARRIVAL_RATE_SHORT_WINDOW") or 60)
+ARRIVAL_RATE_WINDOW = float(os.getenv("ARRIVAL_RATE_WINDOW") or 600)
+# Share of participations that should find a ready warm simulation
+WARM_POOL_TARGET_PERCENTILE = float(os.getenv("WARM_POOL_TARGET_PERCENTILE") or 0.95)
+# Seconds a new simulation needs to become ready, until one was measured
+WARM_POOL_STARTUP_TIME = float(os.getenv("WARM_POOL_STARTUP_TIME") or 60)
+# Upper bound of the predicted pool size, 0 keeps the pools at warmPoolSize
+WARM_POOL_MAX_SIZE = int(os.getenv("WARM_POOL_MAX_SIZE") or 10)
+
+# Weight of the latest measured startup time in its moving average
+STARTUP_TIME_SMOOTHING = 0.3
+
+
+class ArrivalRate:
+    """Exponentially weighted moving rate of arrivals per second."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._weight = 0.0
+        self._last: Optional[float] = None
+
+    def add(self, at: float):
+        if self._last is None or at >= self._last:
+            self._weight = self.weight(at) + 1
+            self._last = at
+        else:
+            self._weight += math.exp((at - self._last) / self.window)
+
+    def weight(self, at: float) -> float:
+        if self._last is None:
+            return 0.0
+        return self._weight * math.exp(-max(at - self._last, 0) / self.window)
+
+    def rate(self, at: float) -> float:
+        return self.weight(at) / self.window
+
+
+def poisson_quantile(mean: float, percentile: float, limit: int) -> int:
+    """Smallest n with P(X <= n) >= percentile for X ~ Poisson(mean), or limit."""
+    n = 0
+    probability = math.exp(-mean)
+    cumulative = probability
+    while cumulative < percentile and n < limit:
+        n += 1
+        probability *= mean / n
+        cumulative += probability
+    return n
+
+
+class WarmPoolScaler:
+    """
+    Predicts the warm pool size of each survey from the arrival rate of its
+    participations. A claimed simulation is replaced by one that is ready
+    after the lead time (startup time plus the interval of the pool check),
+    so participants wait when more of them arrive within one lead time than
+    the pool holds. With Poisson arrivals, the pool size is the quantile of
+    the arrivals within the lead time at the target percentile.
+    """
+
+    def __init__(
+        self,
+        short_window: float = ARRIVAL_RATE_SHORT_WINDOW,
+        window: float = ARRIVAL_RATE_WINDOW,
+        percentile: float = WARM_POOL_TARGET_PERCENTILE,
+        startup_time: float = WARM_POOL_STARTUP_TIME,
+        max_size: int = WARM_POOL_MAX_SIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.windows = (short_window, window)
+        self.percentile = percentile
+        self.default_startup_time = startup_time
+        self.max_size = max_size
+        self.clock = clock
+        self._arrivals: Dict[str, Tuple[ArrivalRate, ...]] = {}
+        self._startup_times: Dict[str, float] = {}
+        self._measured: Dict[str, Set[str]] = {}
+
+    def record_arrival(self, survey: str, at: Optional[float] = None):
+        at = self.clock() if at is None else at
+        if survey not in self._arrivals:
+            self._arrivals[survey] = tuple(ArrivalRate(w) for w in self.windows)
+        for arrivals in self._arrivals[survey]:
+            arrivals.add(at)
+
+    def record_startup_times(self, survey: str, startup_times: Dict[str, float]):
+        """
+        Adds the seconds the given simulations needed to become ready to the
+        survey's average, each simulation once.
+        """
+        measured = self._measured.setdefault(survey, set())
+        for name, seconds in startup_times.items():
+            if name in measured:
+                continue
+            previous = self._startup_times.get(survey, seconds)
+            self._startup_times[survey] = previous + STARTUP_TIME_SMOOTHING * (
+                seconds - previous
+            )
+        # forget simulations that were claimed or removed
+        self._measured[survey] = set(startup_times)
+
+    def forget(self, survey: str):
+        self._arrivals.pop(survey, None)
+        self._startup_times.pop(survey, None)
+        self._measured.pop(survey, None)
+
+    def arrival_rate(self, survey: str) -> float:
+        now = self.clock()
+        return max((a.rate(now) for a in self._arrivals.get(survey, ())), default=0.0)
+
+    def startup_time(self, survey: str) -> float:
+        return self._startup_times.get(survey, self.default_startup_time)
+
+    def target_size(self, survey: str, minimum: int, check_interval: float) -> int:
+        """
+        Pool size for the survey, at least its configured warmPoolSize. Surveys
+        with a warmPoolSize of 0 don't keep a pool.
+        """
+        if minimum == 0 or self.max_size <= minimum:
+            return minimum
+        lead_time = self.startup_time(survey) + check_interval
+        expected = self.arrival_rate(survey) * lead_time
+        return max(minimum, poisson_quantile(expected, self.percentile, self.max_size))